@@ -0,0 +1,68 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared state of the ASGI serving mode (asgi.py). Flask views run on the
+# view pool; work that is naturally asynchronous (HTTP fetches, waiting on
+# OCR jobs) runs on the server's event loop instead of tying up threads.
+# Under a plain WSGI server no loop is registered and callers use their
+# blocking code paths.
+ASGI_WORKER_THREADS = int(os.environ.get('ASGI_WORKER_THREADS', 32))    # requests handled at once
+ASGI_OFFLOAD_THREADS = int(os.environ.get('ASGI_OFFLOAD_THREADS', 8))    # blocking calls made from coroutines
+
+_loop = None
+_view_executor = None
+# Separate from the view pool: a view blocked in run_coroutine() waits on
+# coroutines that offload here, and would deadlock if every view thread
+# were busy doing the same
+_offload_executor = None
+
+def start(loop):
+    """Register the serving event loop and create the view and offload pools."""
+    global _loop, _view_executor, _offload_executor
+    _loop = loop
+    if _view_executor is None:
+        _view_executor = ThreadPoolExecutor(max_workers=ASGI_WORKER_THREADS, thread_name_prefix='asgi-worker')
+    if _offload_executor is None:
+        _offload_executor = ThreadPoolExecutor(max_workers=ASGI_OFFLOAD_THREADS, thread_name_prefix='asgi-offload')
+
+def stop():
+    global _loop, _view_executor, _offload_executor
+    executors = (_view_executor, _offload_executor)
+    _view_executor = _offload_executor = _loop = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+def event_loop():
+    # The ASGI server's loop, or None when serving through WSGI
+    return _loop
+
+def run_view(func, *args):
+    """Await func(*args) on the view pool; asgi.py runs each request's Flask view this way."""
+    return asyncio.get_running_loop().run_in_executor(_view_executor, func, *args)
+
+def offload(func, *args):
+    """Await func(*args) on the offload pool; for blocking calls (SQLite, parsing) made from the loop."""
+    # run_in_executor doesn't carry context variables over (asyncio.to_thread does the same)
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    return asyncio.get_running_loop().run_in_executor(_offload_executor, call)
+
+def run_coroutine(coro):
+    """
+    Run coro on the serving event loop and wait for its result. Called from
+    a view on a view pool thread, so many concurrent fetches share the loop
+    instead of each needing a thread of their own.
+    """
+    # The task would otherwise start from the loop's context; give it the
+    # view's, so the request's metrics see the work done on its behalf
+    context = contextvars.copy_context()
+
+    async def in_view_context():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    return asyncio.run_coroutine_threadsafe(in_view_context(), _loop).result()
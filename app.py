@@ -1,139 +1,111 @@
-from flask import Flask, render_template, redirect, url_for, request, session
-from bs4 import BeautifulSoup
-from PIL import Image, ImageEnhance
-from database import fetch_all_questions, insert_question, update_question_in_db, delete_question, insert_quiz_history, fetch_quiz_history, init_db, fetch_question_by_id, fetch_questions_by_ids
-from datetime import datetime
-from random import sample
-import pytesseract
-import requests
-import cv2
-import numpy as np
+from flask import Flask, Request, Response, render_template, stream_template, stream_with_context, redirect, url_for, request, session, jsonify, abort, flash, get_flashed_messages, g, before_render_template, template_rendered
+from database import fetch_questions_page, iter_questions, insert_question, insert_questions, update_question_in_db, delete_question, insert_quiz_history, fetch_quiz_history, fetch_history_rollup, init_db, fetch_question_by_id, fetch_questions_by_ids, fetch_random_questions, cache_stats, search_questions, find_duplicate_question, SNIPPET_START, SNIPPET_END
+from io import BytesIO, TextIOWrapper
+from tempfile import SpooledTemporaryFile
+from markupsafe import Markup, escape
+from ocr_pool import OCRBusyError
+from ocr_jobs import submit_ocr_job, submit_ocr_batch_job, get_ocr_job, ocr_cache_stats
+from question_stats import record_answers, question_rankings, question_stats_counters
+from selection import select_question_ids, record_results as record_selection_results
+from scheduler import schedule_reviews, due_question_ids, due_review_count
+from grading import mask_choices, score_status, ANSWER_SEPARATOR
+from quiz_sessions import start_quiz_session, load_quiz_session, end_quiz_session, grade_quiz
+from question_parser import iter_chunks, iter_text_questions
+import aio
+import metrics
 import os
 import re
 import logging
+import time
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key'
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-
-# Preprocess the image for better OCR performance
-def preprocess_image(image):
-    logging.debug("Preprocessing the image for better OCR.")
-    # Convert image to grayscale
-    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
-
-    # Apply thresholding to get a binary image (binarization)
-    _, binary_image = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-    # Denoising to remove potential noise and artifacts
-    denoised_image = cv2.fastNlMeansDenoising(binary_image, None, 30, 7, 21)
-
-    # Sharpen the image using a kernel
-    kernel = np.array([[0, -1, 0], [-1, 5,-1], [0, -1, 0]])
-    sharpened_image = cv2.filter2D(denoised_image, -1, kernel)
-
-    return Image.fromarray(sharpened_image)
-
-def extract_text(image):
-    logging.debug("Running Tesseract OCR on the preprocessed image.")
-    config = "--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,:()[]"
-    extracted_text = pytesseract.image_to_string(image, config=config)
-    return extracted_text
-
-def correct_spacing(extracted_text):
-    logging.debug("Correcting spacing issues in the extracted text.")
-    
-    # Insert space after periods (A., B., C., etc.)
-    corrected_text = re.sub(r'([A-Z])\.', r'\1. ', extracted_text)
+# Non-image uploads (question dumps) larger than this spool to a temp file
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', 1024 * 1024))
 
-    # Handle cases where OCR output is squashed together
-    corrected_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', corrected_text)
-    corrected_text = re.sub(r'([A-Z][a-z])([A-Z][a-z])', r'\1 \2', corrected_text)
-
-    # Ensure spaces around symbols like colon or parenthesis
-    corrected_text = re.sub(r'([a-zA-Z0-9])([:,()])', r'\1 \2', corrected_text)
-    corrected_text = re.sub(r'([:,()])([a-zA-Z0-9])', r'\1 \2', corrected_text)
-
-    return corrected_text
-
-def extract_questions_and_choices(text):
-    """
-    Extract questions, choices, and answers from the corrected text.
-    Assumes:
-    - Question starts with "Question X ( Single Topic )"
-    - Choices are A., B., C., D., etc.
-    - Answer is indicated by "Answer :"
-    """
-    logging.debug("Extracting questions and choices from text.")
-    
-    questions = []
-    current_question = None
-    current_choices = []
-    current_answer = None
-    inside_question = False
-    
-    lines = text.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-
-        if not line:
-            continue
-        
-        # Skip reference lines or 'Next Question'
-        if re.match(r'Reference|Next Question', line):
-            logging.debug(f"Skipping reference or 'Next Question' line: {line}")
-            continue
-        
-        # Detect the start of a new question
-        if re.match(r'Question\s?\d+\s?\( Single Topic \)', line):
-            # If there's a current question, store it
-            if current_question and current_choices:
-                questions.append({
-                    'question': current_question.strip(),
-                    'choices': current_choices,
-                    'answer': current_answer
-                })
-            # Start a new question
-            current_question = ""
-            current_choices = []
-            current_answer = None
-            inside_question = True
-            logging.debug(f"New question detected: {line}")
-            continue
-        
-        # Detect and append choices (A., B., C., D., etc.)
-        match_choice = re.match(r'([A-Za-z])\.\s?(.*)', line)
-        if match_choice:
-            choice_label = match_choice.group(1).upper()  # A, B, C, D
-            choice_text = match_choice.group(2).strip()
-            current_choices.append(f"{choice_label}. {choice_text}")
-            logging.debug(f"Choice detected: {choice_label}. {choice_text}")
-            continue
-        
-        # Detect answer
-        match_answer = re.match(r'Answer\s?:\s?(.*)', line)
-        if match_answer:
-            current_answer = match_answer.group(1).strip()
-            logging.debug(f"Answer detected: {current_answer}")
-            continue
-        
-        # Append to the current question
-        if inside_question and not match_choice and not match_answer:
-            current_question += " " + line
-            logging.debug(f"Appending to current question: {line}")
-
-    # Add the final question if any
-    if current_question and current_choices:
-        questions.append({
-            'question': current_question.strip(),
-            'choices': current_choices,
-            'answer': current_answer
-        })
+class InMemoryUploadRequest(Request):
+    # Keep uploaded screenshots in memory instead of letting large ones spool to a temp file;
+    # MAX_CONTENT_LENGTH bounds how much a single request can buffer
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if content_type and content_type.startswith('image/'):
+            return BytesIO()
+        # Text dumps are parsed in chunks, so there is no reason to hold them whole
+        return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode='rb+')
 
-    return questions
+app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
+app.config['SECRET_KEY'] = 'your_secret_key'
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 64 * 1024 * 1024))
+
+# Number of questions drawn for each quiz, and the most a ?length= may ask for
+QUIZ_LENGTH = int(os.environ.get('QUIZ_LENGTH', 40))
+QUIZ_MAX_LENGTH = int(os.environ.get('QUIZ_MAX_LENGTH', 500))
+
+# Quizzes per history page
+HISTORY_PAGE_SIZE = 50
+
+# 'adaptive' favours questions answered wrong or not seen lately; 'uniform' samples evenly
+QUIZ_SELECTION = os.environ.get('QUIZ_SELECTION', 'adaptive')
+
+# Give multi-select questions a share of the point for each correct pick
+QUIZ_PARTIAL_CREDIT = os.environ.get('QUIZ_PARTIAL_CREDIT', '0') == '1'
+
+# Questions per manage_questions page, and the most a ?limit= may ask for
+MANAGE_PAGE_SIZE = 100
+MANAGE_MAX_PAGE_SIZE = 1000
+
+# Quiz-only workers serve quizzes, history and question management but not
+# URL or screenshot ingestion, so they never load requests, BeautifulSoup,
+# OpenCV or Tesseract
+QUIZ_ONLY = os.environ.get('QUIZ_ONLY', '0') == '1'
+INGESTION_ENDPOINTS = {'add_questions_from_url', 'process_url', 'add_questions_from_image',
+                       'process_image', 'process_images', 'ocr_job_status', 'ocr_job_result'}
+
+# Configure logging; LOG_LEVEL=DEBUG turns on the per-line OCR and parser logs
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Start the sampling profiler at boot; it can also be toggled at /metrics/profiler
+if os.environ.get('PROFILER_ENABLED', '0') == '1':
+    metrics.profiler.start()
+
+if QUIZ_ONLY:
+    @app.before_request
+    def reject_ingestion():
+        if request.endpoint in INGESTION_ENDPOINTS:
+            abort(404)
+
+@app.context_processor
+def inject_ingestion_enabled():
+    return {'ingestion_enabled': not QUIZ_ONLY}
+
+if metrics.METRICS_ENABLED:
+    @app.before_request
+    def start_request_metrics():
+        g.metrics = metrics.start_request()
+
+    @app.teardown_request
+    def finish_request_metrics(exc=None):
+        state = g.pop('metrics', None)
+        if state is None:
+            return
+        route = request.endpoint or '<unmatched>'
+        elapsed = metrics.finish_request(state, route)
+        if elapsed > metrics.SLOW_REQUEST_MS:
+            stages = ', '.join(f"{name}={ms:.1f}ms" for name, ms in state['stages'].most_common())
+            logging.warning("Slow request %s %s: %.1fms, %d queries (%s)",
+                            request.method, route, elapsed, state['queries'], stages or 'no stages')
+
+    def _start_render_timer(sender, template, context, **extra):
+        state = g.get('metrics')
+        if state is not None:
+            state['render_started'] = time.perf_counter()
+
+    def _stop_render_timer(sender, template, context, **extra):
+        state = g.get('metrics')
+        if state is not None and 'render_started' in state:
+            metrics.record_stage('render', (time.perf_counter() - state.pop('render_started')) * 1000)
+
+    # Streamed templates only send before_render_template, so they aren't timed as renders
+    before_render_template.connect(_start_render_timer, app)
+    template_rendered.connect(_stop_render_timer, app)
 
 def format_questions(questions):
     formatted_output = ""
@@ -160,19 +132,36 @@ def row_to_dict(row):
 
 # Home route
 @app.route('/')
-async def index():
-    return render_template('index.html')
+def index():
+    return render_template('index.html', due_reviews=due_review_count())
 
 # Start quiz route
 @app.route('/start_quiz')
-async def start_quiz():
-    # Fetch all questions and sample 40 at random
-    all_questions = fetch_all_questions()
-    selected_questions = sample(all_questions, 40)
-    
-    # Extract IDs of selected questions and save in session
-    session['quiz_question_ids'] = [q['id'] for q in selected_questions]
-    
+def start_quiz():
+    length = max(1, min(request.args.get('length', QUIZ_LENGTH, type=int), QUIZ_MAX_LENGTH))
+
+    # Sample question ids and load only the selected questions (fewer if the bank is small)
+    if QUIZ_SELECTION == 'adaptive':
+        selected_questions = fetch_questions_by_ids(select_question_ids(length))
+    else:
+        selected_questions = fetch_random_questions(length)
+    if not selected_questions:
+        return redirect(url_for('manage_questions'))
+    return render_quiz(selected_questions)
+
+# Review quiz route: the questions whose spaced-repetition review is due, most overdue first
+@app.route('/start_review')
+def start_review():
+    selected_questions = fetch_questions_by_ids(due_question_ids(QUIZ_LENGTH))
+    if not selected_questions:
+        flash("No reviews are due right now")
+        return redirect(url_for('index'))
+    return render_quiz(selected_questions)
+
+def render_quiz(selected_questions):
+    # The questions and their answer key are stored server-side; the cookie only holds the token
+    session['quiz_token'] = start_quiz_session(selected_questions)
+
     # Prepare questions for display
     formatted_questions = []
     for question in selected_questions:
@@ -184,115 +173,171 @@ async def start_quiz():
 
 # Submit quiz route
 @app.route('/submit_quiz', methods=['POST'])
-async def submit_quiz():
+def submit_quiz():
     user_answers = request.form.to_dict(flat=False)
-    correct_answers = {}
-    selected_answers = {}
-    total_correct = 0
-    
-    # Retrieve the IDs of selected questions from the session
-    question_ids = session.get('quiz_question_ids', [])
-    
-    # Fetch only the selected questions from the database
-    questions = fetch_questions_by_ids(question_ids)  # Ensure `fetch_questions_by_ids` is defined in `database.py`
 
-    for question in questions:
-        user_answer = user_answers.get(f'answer_{question["id"]}')
-        correct_answer = question['correct_answer']
-        
-        if isinstance(user_answer, list):  # If multiple answers
-            selected_answers[question["id"]] = ", ".join(user_answer)
-            combined_user_answer = ", ".join(user_answer)
-            if combined_user_answer == correct_answer:
-                total_correct += 1
-                correct_answers[question['id']] = 'correct'
-            else:
-                correct_answers[question['id']] = 'wrong'
-        else:
-            selected_answers[question["id"]] = user_answer
-            if user_answer == correct_answer:
-                total_correct += 1
-                correct_answers[question['id']] = 'correct'
-            else:
-                correct_answers[question['id']] = 'wrong'
-    
-    # Store quiz history
-    insert_quiz_history(total_correct, len(questions))
+    # Look up the quiz started in this session; ending it first means it is only graded once
+    token = session.pop('quiz_token', None)
+    quiz = load_quiz_session(token) if token else None
+    if quiz is None or not end_quiz_session(token):
+        flash("This quiz has expired or was already submitted")
+        return redirect(url_for('index'))
+
+    # Scored from the stored answer key and reviewed from the stored question texts
+    results, score = grade_quiz(quiz, user_answers, partial_credit=QUIZ_PARTIAL_CREDIT)
+    questions = quiz['questions']
 
-    return render_template('review.html', correct_answers=correct_answers, selected_answers=selected_answers, questions=questions)
+    selected_answers = {}
+    correct_answers = {}
+    scores = {}
+    for question in questions:
+        selected, question_score = results[question['id']]
+        selected_answers[question['id']] = ANSWER_SEPARATOR.join(mask_choices(selected, question['choices']))
+        correct_answers[question['id']] = score_status(question_score)
+        scores[question['id']] = question_score
+
+    # Store quiz history; per-question counts are buffered and written in batches
+    insert_quiz_history(score, len(quiz['question_ids']))
+    answer_scores = [(question_id, question_score) for question_id, (_, question_score) in results.items()]
+    record_answers(answer_scores)
+    record_selection_results(answer_scores)
+    schedule_reviews(answer_scores)
+
+    return render_template('review.html', correct_answers=correct_answers, selected_answers=selected_answers,
+                           scores=scores, questions=questions, duration=time.time() - quiz['started_at'])
+
+def highlight_snippet(snippet):
+    # Escape the snippet text, then turn the search match markers into <mark> tags
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
 
 # Manage questions route
 @app.route('/manage_questions')
-async def manage_questions():
-    questions = fetch_all_questions()
-    return render_template('manage_questions.html', questions=questions)
+def manage_questions():
+    search = request.args.get('q', '').strip()
+    if search:
+        # Ranked full-text matches, loaded with their choices
+        results = search_questions(search, limit=request.args.get('limit', 50, type=int))
+        snippets = {result['id']: highlight_snippet(result['snippet']) for result in results}
+        questions = fetch_questions_by_ids([result['id'] for result in results])
+        return render_template('manage_questions.html', questions=questions, search=search, snippets=snippets,
+                               messages=get_flashed_messages())
+
+    if request.args.get('all'):
+        # The whole bank, read in keyset batches while the page streams out
+        questions, next_after, limit = iter_questions(), None, None
+    else:
+        after = request.args.get('after', 0, type=int)
+        limit = max(1, min(request.args.get('limit', MANAGE_PAGE_SIZE, type=int), MANAGE_MAX_PAGE_SIZE))
+        questions, next_after = fetch_questions_page(after, limit)
+    # Take the flashes now: the session is saved before the streamed body renders,
+    # so popping them from the template would leave them in the cookie
+    messages = get_flashed_messages()
+    return Response(stream_with_context(stream_template('manage_questions.html', questions=questions,
+                                                        next_after=next_after, limit=limit, messages=messages)))
+
+# Ranked question search with highlighted snippets, as JSON
+@app.route('/search_questions')
+def search_questions_route():
+    search = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    offset = request.args.get('offset', 0, type=int)
+    results = search_questions(search, limit=limit, offset=offset) if search else []
+    return jsonify(query=search, results=[
+        {'id': result['id'], 'question': result['question'], 'snippet': str(highlight_snippet(result['snippet']))}
+        for result in results
+    ])
 
 # Add question route
 @app.route('/add_question')
-async def add_question():
+def add_question():
     return render_template('add_question.html')
 
 # Add questions from URL route
 @app.route('/add_questions_from_url')
-async def add_questions_from_url():
+def add_questions_from_url():
     return render_template('add_questions_from_url.html')
 
-# Process the URL to extract questions
+# Process one or more URLs (one per line) to extract questions
 @app.route('/process_url', methods=['POST'])
-async def process_url():
-    url = request.form['url']
-
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        questions = []
-        for card in soup.find_all('div', class_='card'):
-            question_text = card.find('div', class_='question_text').get_text(strip=True)
-
-            choices = [choice.get_text(strip=True) for choice in card.find('ul', class_='choices-list').find_all('li')]
+def process_url():
+    urls = [url.strip() for url in request.form['url'].splitlines() if url.strip()]
+    max_pages = request.form.get('max_pages', 1, type=int)
+    if not urls:
+        return "No URL provided", 400
+
+    # requests and BeautifulSoup are only loaded once a URL is ingested
+    from url_ingest import ingest_urls, ingest_urls_async
+    if aio.event_loop() is not None:
+        # Served through asgi.py: the pages are fetched on the event loop
+        questions, errors = aio.run_coroutine(ingest_urls_async(urls, max_pages=max_pages))
+    else:
+        questions, errors = ingest_urls(urls, max_pages=max_pages)
+
+    if not questions:
+        if errors:
+            return f"Error fetching content from the URL: {errors[0][1]}", 500
+        return "No valid questions found from the provided URL", 400
+
+    warning = f"Could not fetch: {', '.join(url for url, _ in errors)}" if errors else None
+    return render_template('questions_from_url.html', questions=list(flag_duplicates(questions)), warning=warning)
+
+def flag_duplicates(questions):
+    # Point out questions the bank already has, so the reviewer can leave them out
+    for question in questions:
+        question['duplicate_of'] = find_duplicate_question(question['question'], question['choices'])
+        yield question
 
-            if len(choices) >= 2:  # Ensure there are at least 2 choices
-                questions.append({
-                    'question': question_text,
-                    'choices': choices
-                })
+def questions_from_form(form):
+    """
+    Collect the questions of a review form (question_<i>, choice_<i>_<j>,
+    correct_answer_<i>, multiple_selection_<i>) in question order.
+    """
+    indexes = sorted(int(key.split('_', 1)[1]) for key in form if re.fullmatch(r'question_\d+', key))
 
-        if not questions:
-            return "No valid questions found from the provided URL", 400
+    questions = []
+    for i in indexes:
+        choices = []
+        j = 1
+        while f'choice_{i}_{j}' in form:
+            choices.append(form[f'choice_{i}_{j}'])
+            j += 1
 
-        return render_template('questions_from_url.html', questions=questions)
+        # Checkboxes send 'on'; the text review page also sends a hidden 'true'/'false'
+        selection_values = form.getlist(f'multiple_selection_{i}')
+        questions.append({
+            'question': form[f'question_{i}'],
+            'correct_answer': form.get(f'correct_answer_{i}', ''),
+            'choices': choices,
+            'multiple_selection': 'on' in selection_values or 'true' in selection_values,
+        })
+    return questions
 
-    except requests.exceptions.RequestException as e:
-        return f"Error fetching content from the URL: {str(e)}", 500
+def save_reviewed_questions(form):
+    # Insert every question of a review form in one transaction and report the rejects;
+    # duplicates of questions already in the bank are skipped unless the reviewer opts in
+    questions = questions_from_form(form)
+    inserted_ids, errors = insert_questions(questions, skip_duplicates=not form.get('allow_duplicates'))
+    for index, error in errors:
+        logging.warning(f"Skipped question {index + 1}: {error}")
+        flash(f"Question {index + 1} was not saved: {error}")
+    if inserted_ids:
+        flash(f"Saved {len(inserted_ids)} questions")
+    return redirect(url_for('manage_questions'))
 
 # Save questions extracted from the URL
 @app.route('/save_questions_from_url', methods=['POST'])
-async def save_questions_from_url():
-    question_data = request.form.to_dict()
-    num_questions = len(question_data) // 6
-
-    for i in range(1, num_questions + 1):
-        question = question_data.get(f'question_{i}')
-        correct_answer = question_data.get(f'correct_answer_{i}')
-        choices = [question_data.get(f'choice_{i}_{j}') for j in range(1, 5)]
-        multiple_selection = f'multiple_selection_{i}' in question_data
-
-        if question and correct_answer and all(choices):
-            insert_question(question, correct_answer, choices, multiple_selection)
-
-    return redirect(url_for('manage_questions'))
+def save_questions_from_url():
+    return save_reviewed_questions(request.form)
 
 # Add questions from image route
 @app.route('/add_questions_from_image')
-async def add_questions_from_image():
+def add_questions_from_image():
     return render_template('add_questions_from_image.html')
 
 # Process uploaded screenshot and extract text
 @app.route('/process_image', methods=['POST'])
-async def process_image():
+def process_image():
     if 'screenshot' not in request.files:
         return "No file uploaded", 400
     
@@ -300,41 +345,89 @@ async def process_image():
     if file.filename == '':
         return "No selected file", 400
 
-    # Save the uploaded file
-    file_path = os.path.join('uploads', file.filename)
-    file.save(file_path)
-
     try:
-        # Open and preprocess the image
-        image = Image.open(file_path)
-        preprocessed_image = preprocess_image(image)
-
-        # Extract text using Tesseract
-        extracted_text = extract_text(preprocessed_image)
-
-        logging.debug("Extracted Text Before Correction:\n" + extracted_text)
-
-        # Correct missing spaces
-        corrected_text = correct_spacing(extracted_text)
-
-        logging.debug("Corrected Text:\n" + corrected_text)
-
-        # Process the corrected text to extract questions and choices
-        questions = extract_questions_and_choices(corrected_text)
-
-        logging.debug(f"All processed questions: {questions}")
-
-        os.remove(file_path)
-
-        return render_template('questions_from_url.html', questions=questions)
-
+        # The upload is kept in memory and handed to the OCR workers as bytes;
+        # the client polls the job until it is done
+        job_id = submit_ocr_job(file.read())
+    except OCRBusyError:
+        logging.warning("OCR queue is full, rejecting upload")
+        return "Too many screenshots are being processed, please try again shortly", 503, {'Retry-After': '10'}
     except Exception as e:
         logging.error(f"Error processing image: {str(e)}")
         return f"Error processing image: {str(e)}", 500
 
+    # Screenshots seen before come back from the OCR cache already done
+    job = get_ocr_job(job_id)
+    done = job is not None and job['status'] == 'done'
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job_id=job_id, status_url=url_for('ocr_job_status', job_id=job_id)), 200 if done else 202
+    if done:
+        return render_template('questions_from_url.html', questions=list(flag_duplicates(job['result'])))
+    return render_template('ocr_job.html', job_id=job_id), 202
+
+# Process several screenshots or multi-page TIFFs as one batch
+@app.route('/process_images', methods=['POST'])
+def process_images():
+    files = [file for file in request.files.getlist('screenshots') if file.filename]
+    if not files:
+        return "No file uploaded", 400
+
+    try:
+        job_id = submit_ocr_batch_job([file.read() for file in files])
+    except OCRBusyError:
+        logging.warning("Too many OCR batches running, rejecting upload")
+        return "Too many uploads are being processed, please try again shortly", 503, {'Retry-After': '30'}
+    except Exception as e:
+        logging.error(f"Error processing images: {str(e)}")
+        return f"Error processing images: {str(e)}", 500
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job_id=job_id, status_url=url_for('ocr_job_status', job_id=job_id)), 202
+    return render_template('ocr_job.html', job_id=job_id), 202
+
+def ocr_job_throughput(job):
+    # Pages per second over the job's lifetime, once it has finished
+    if job['finished_at'] is None or job['finished_at'] <= job['created_at']:
+        return None
+    return job['pages'] / (job['finished_at'] - job['created_at'])
+
+# Status of a background OCR job
+@app.route('/ocr_jobs/<job_id>')
+def ocr_job_status(job_id):
+    job = get_ocr_job(job_id)
+    if job is None:
+        return jsonify(error="Unknown or expired job"), 404
+
+    return jsonify(
+        id=job['id'],
+        status=job['status'],
+        created_at=job['created_at'],
+        finished_at=job['finished_at'],
+        error=job['error'],
+        pages=job['pages'],
+        pages_per_sec=ocr_job_throughput(job),
+        question_count=len(job['result']) if job['result'] is not None else None,
+        result_url=url_for('ocr_job_result', job_id=job_id),
+    )
+
+# Review page for the questions extracted by a finished OCR job
+@app.route('/ocr_jobs/<job_id>/result')
+def ocr_job_result(job_id):
+    job = get_ocr_job(job_id)
+    if job is None:
+        return "Unknown or expired job", 404
+    if job['status'] == 'pending':
+        return "The screenshot is still being processed", 202
+    if job['status'] == 'failed':
+        return f"Error processing image: {job['error']}", 500
+
+    return render_template('questions_from_url.html', questions=list(flag_duplicates(job['result'])), warning=job['error'],
+                           pages=job['pages'], pages_per_sec=ocr_job_throughput(job))
+
 # Save new question route
 @app.route('/save_question', methods=['POST'])
-async def save_question():
+def save_question():
     question = request.form['question']
     correct_answer = request.form['correct_answer']
     choices = [request.form[f'choice{i}'] for i in range(1, 5)]
@@ -345,14 +438,16 @@ async def save_question():
 
 # Edit question route
 @app.route('/edit_question/<int:question_id>')
-async def edit_question(question_id):
-    question = fetch_question_by_id(question_id)  # Ensure this function fetches the question correctly
+def edit_question(question_id):
+    question = fetch_question_by_id(question_id)
+    if question is None:
+        abort(404)
     choices = question["choices"]
     return render_template('edit_question.html', question=question, choices=choices)
 
 # Update question route
 @app.route('/update_question/<int:question_id>', methods=['POST'])
-async def update_question(question_id):
+def update_question(question_id):
     question = request.form['question']
     correct_answer = request.form['correct_answer']
 
@@ -379,121 +474,119 @@ async def update_question(question_id):
 
 # Delete question route
 @app.route('/delete_question/<int:question_id>', methods=['POST'])
-async def delete_question_route(question_id):
+def delete_question_route(question_id):
     delete_question(question_id)
     return redirect(url_for('manage_questions'))
 
 # Add questions from text route
 @app.route('/add_questions_from_text')
-async def add_questions_from_text():
+def add_questions_from_text():
     return render_template('add_questions_from_text.html')
 
-# Process text input from the form
+def iter_upload_chunks(stream):
+    # Decode and read an uploaded dump in chunks, closing it when done. The
+    # generator owns the stream: request.close() runs before a streamed body
+    # is rendered and would close it if it were still in request.files.
+    try:
+        yield from iter_chunks(TextIOWrapper(stream, encoding='utf-8', errors='replace'))
+    finally:
+        stream.close()
+
+# Process text input from the form, or an uploaded .txt dump
 @app.route('/process_text', methods=['POST'])
-async def process_text():
-    raw_text = request.form['questionText']
-    
-    # Split questions based on a pattern like "Question X ( Single Topic )"
-    question_blocks = re.split(r'(Question \d+ \( Single Topic \))', raw_text)
-    
-    questions = []
-    
-    for i in range(1, len(question_blocks), 2):
-        question_title = question_blocks[i].strip()
-        question_body = question_blocks[i + 1].strip()
-
-        # Extract question content before choices (anything before A.)
-        question_content_match = re.search(r'^(.+?)(?=A\.)', question_body, re.DOTALL)
-        question_content = question_content_match.group(1).strip() if question_content_match else ""
-
-        # Extract the choices (A., B., C., etc.)
-        choices_match = re.findall(r'([A-Z]\.\s?.+)', question_body)
-        choices = [choice[2:].strip() for choice in choices_match]
-
-        # Extract the correct answer(s) (handles cases like "A", "B", or "CD")
-        answer_match = re.search(r'Answer :\s?([A-Z, ]+)', question_body)
-        answer_letters = answer_match.group(1).strip() if answer_match else "N/A"
-
-        correct_answers = []
-        if answer_letters != "N/A":
-            # Split the answer string into individual letters (e.g., "CD" -> ['C', 'D'])
-            answer_letters = re.findall(r'[A-Z]', answer_letters)
-
-            # Map each letter to the corresponding choice text
-            for answer_letter in answer_letters:
-                answer_index = ord(answer_letter) - ord('A')  # Convert A, B, C, D to index 0, 1, 2, 3
-                if 0 <= answer_index < len(choices):
-                    correct_answers.append(choices[answer_index])
-
-        # Append the question to the list
-        if question_content and len(choices) >= 2 and correct_answers:
-            questions.append({
-                'question': question_content,
-                'choices': choices,
-                'correct_answer': ", ".join(correct_answers),  # Store as a comma-separated string
-                'index': i // 2 + 1  # Add index to each question object
-            })
-
-    # Render the review page for questions from text
-    return render_template('questions_from_text.html', questions=questions)
+def process_text():
+    upload = request.files.get('questionFile')
+    if upload and upload.filename:
+        # Parse the upload in chunks instead of reading it into one string
+        stream, upload.stream = upload.stream, BytesIO()
+        source = iter_upload_chunks(stream)
+    else:
+        source = request.form.get('questionText', '')
+
+    # Questions are parsed while the review page is rendered, so neither the
+    # question list nor the page is ever held in memory as a whole
+    questions = flag_duplicates(iter_text_questions(source))
+    return Response(stream_with_context(stream_template('questions_from_text.html', questions=questions)))
 
 @app.route('/save_questions_from_text', methods=['POST'])
-async def save_questions_from_text():
-    question_data = request.form.to_dict(flat=False)
-
-    num_questions = len([key for key in question_data.keys() if key.startswith('question_')])
-
-    for i in range(1, num_questions + 1):
-        question = question_data.get(f'question_{i}')[0]
-        correct_answer = question_data.get(f'correct_answer_{i}')[0]
-        
-        # Extract choices
-        choices = []
-        j = 1
-        while True:
-            choice_key = f'choice_{i}_{j}'
-            if choice_key in question_data:
-                choices.append(question_data.get(choice_key)[0])
-            else:
-                break
-        # for j in range(1, 7):  # Assuming a fixed number of 4 choices
-        #     choice_key = f'choice_{i}_{j}'
-        #     if choice_key in question_data:
-        #         choices.append(question_data.get(choice_key)[0])
-
-        # Multiple selection check (optional)
-        multiple_selection = request.form.get(f'multiple_selection_{i}') == 'true'
-
-        # Insert into database
-        if question and correct_answer and len(choices) == 4:  # Ensure all choices are present
-            insert_question(question, correct_answer, choices, multiple_selection)
+def save_questions_from_text():
+    return save_reviewed_questions(request.form)
 
-    return redirect(url_for('manage_questions'))
-
-# Quiz history route
+# Quiz history route, newest first, one page at a time
 @app.route('/history')
-async def history():
-    history = fetch_quiz_history()
-    return render_template('history.html', history=history)
+def history():
+    # A cursor with a missing or unparseable half is ignored and the newest page shown
+    before = None
+    before_id = request.args.get('before_id', type=int)
+    if request.args.get('before_date') and before_id is not None:
+        before = (request.args['before_date'], before_id)
+    history = fetch_quiz_history(limit=HISTORY_PAGE_SIZE + 1, before=before)
+
+    # One extra row tells us whether there is an older page
+    older = None
+    if len(history) > HISTORY_PAGE_SIZE:
+        history = history[:HISTORY_PAGE_SIZE]
+        older = {'before_date': history[-1]['date_taken'], 'before_id': history[-1]['id']}
+    return render_template('history.html', history=history, older=older)
 
 # New route to generate the report
 @app.route('/generate_report')
 def generate_report():
-    history = fetch_quiz_history()
-
-    # Extract data for the report (dates and scores)
-    dates = [entry['date_taken'] for entry in history]
-    scores = [(entry['correct_answers'] / entry['total_questions']) * 100 for entry in history]
+    # Served from the daily/weekly rollups maintained by insert_quiz_history
+    period = request.args.get('period', 'daily')
+    if period not in ('daily', 'weekly'):
+        period = 'daily'
+    rollup = fetch_history_rollup(period, since=request.args.get('since'))
 
-    # Format the dates to remove seconds (use strftime)
-    formatted_dates = [datetime.strptime(date, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M') for date in dates]
+    dates = [row['period'] for row in rollup]
+    scores = [row['mean'] for row in rollup]
+    moving_average = [row['moving_average'] for row in rollup]
+    best = [row['best'] for row in rollup]
 
     # Calculate the maximum score to add a buffer above the highest value
-    max_score = max(scores) if scores else 100  # Ensure it doesn't fail if scores list is empty
+    max_score = max(best) if best else 100  # Ensure it doesn't fail if there is no history
     y_max = min(max_score + 10, 110)  # Add a buffer of 10% but don't exceed 100%
 
-    # Pass the formatted dates and scores to the template, along with the max y value
-    return render_template('report.html', quizDates=formatted_dates, quizPercentages=scores, y_max=y_max)
+    return render_template('report.html', quizDates=dates, quizPercentages=scores, movingAverage=moving_average,
+                           bestPercentages=best, y_max=y_max, period=period)
+
+# Cache counters, to check that question reads and repeated OCR uploads skip the slow path
+@app.route('/stats/cache')
+def cache_stats_route():
+    stats = cache_stats()
+    stats['ocr'] = ocr_cache_stats()
+    return jsonify(stats)
+
+# Hardest (or easiest, with ?order=easiest) questions by share of correct answers
+@app.route('/stats/questions')
+def question_stats_route():
+    hardest = request.args.get('order', 'hardest') != 'easiest'
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    min_attempts = request.args.get('min_attempts', 1, type=int)
+    return jsonify(
+        order='hardest' if hardest else 'easiest',
+        questions=question_rankings(hardest=hardest, limit=limit, min_attempts=min_attempts),
+        buffer=question_stats_counters(),
+    )
+
+# Route latency and SQL query count histograms, and per-stage timers
+@app.route('/metrics')
+def metrics_route():
+    return jsonify(metrics.snapshot())
+
+# Sampling profiler: GET reports the hottest functions, POST enabled=1|0 starts or stops it, reset=1 clears it
+@app.route('/metrics/profiler', methods=['GET', 'POST'])
+def profiler_route():
+    if request.method == 'POST':
+        if request.form.get('reset') == '1':
+            metrics.profiler.reset()
+        enabled = request.form.get('enabled')
+        if enabled == '1':
+            metrics.profiler.start()
+        elif enabled == '0':
+            metrics.profiler.stop()
+    limit = min(request.args.get('limit', 25, type=int), 200)
+    return jsonify(metrics.profiler.report(limit=limit))
 
 if __name__ == '__main__':
     init_db()
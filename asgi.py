@@ -0,0 +1,233 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import sys
+import threading
+from urllib.parse import parse_qs
+
+import aio
+from app import app
+from database import init_db
+from ocr_jobs import running_ocr_job
+from ocr_pool import ocr_pool
+from question_stats import flush_question_stats
+
+# ASGI serving mode: run with an ASGI server, e.g. `uvicorn asgi:application`.
+# The event loop only moves bytes; each request's Flask view runs on the
+# view pool (aio.ASGI_WORKER_THREADS threads, each with its own pooled
+# SQLite connection), so a slow request never blocks the others. URL
+# ingestion fetches its pages on the loop, and GET /ocr_jobs/<id>?wait=N
+# awaits the job's completion on the loop before any thread is used.
+OCR_WAIT_MAX = float(os.environ.get('OCR_WAIT_MAX', 30))  # longest ?wait= honoured, in seconds
+
+OCR_JOB_PATH_RE = re.compile(r'/ocr_jobs/(?P<job_id>[0-9a-f]+)')
+
+# Response bytes gathered on the view thread before they are handed to the
+# loop, and how many such pieces may wait between a streaming view and the client
+_RESPONSE_FLUSH_BYTES = 32 * 1024
+_RESPONSE_QUEUE_SIZE = 4
+
+class _RequestTooLarge(Exception):
+    pass
+
+class _ClientGone(Exception):
+    # Raised on the view thread to stop producing a response nobody will read
+    pass
+
+async def _read_body(receive, limit):
+    # The whole body is buffered before the view runs; refuse it past the app's limit
+    body = io.BytesIO()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body.write(message.get('body', b''))
+        if limit is not None and body.tell() > limit:
+            raise _RequestTooLarge()
+        if not message.get('more_body'):
+            body.seek(0)
+            return body
+
+def _environ(scope, body):
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is fully buffered, chunked or not, so its length is known
+    environ['CONTENT_LENGTH'] = str(body.getbuffer().nbytes)
+    return environ
+
+def _run_view(environ, loop, queue, client_gone):
+    """
+    Run the Flask app for one request on a view pool thread and hand the
+    response to the loop through a bounded queue as (start, body, more)
+    items, start being the status and headers on the first item only.
+    Body chunks are gathered up to _RESPONSE_FLUSH_BYTES per item: a page
+    rendered as many small template chunks costs a few hand-offs instead
+    of one per chunk, and a long streamed page still reaches the client as
+    it renders. The whole response is produced on this one thread, which
+    streamed views rely on. Once client_gone is set the response is
+    abandoned at the next hand-off.
+    """
+    start = []
+    buffered = []
+    size = 0
+    headers_sent = False
+
+    def flush(more):
+        nonlocal size, headers_sent
+        if client_gone.is_set():
+            raise _ClientGone()
+        item = (start.pop() if start else None, b''.join(buffered), more)
+        headers_sent = True
+        buffered.clear()
+        size = 0
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def start_response(status, headers, exc_info=None):
+        start[:] = [(int(status.split(' ', 1)[0]),
+                     [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers])]
+
+    try:
+        response = app(environ, start_response)
+        try:
+            for chunk in response:
+                if chunk:
+                    buffered.append(chunk)
+                    size += len(chunk)
+                    if size >= _RESPONSE_FLUSH_BYTES:
+                        flush(True)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+    except _ClientGone:
+        return
+    except Exception:
+        logging.exception("Error serving %s %s", environ['REQUEST_METHOD'], environ['PATH_INFO'])
+        if not headers_sent:
+            start[:] = [(500, [(b'content-type', b'text/plain; charset=utf-8')])]
+            buffered[:] = [b"Internal Server Error"]
+    try:
+        flush(False)
+    except _ClientGone:
+        pass
+
+async def _send_text(send, status, text):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': text.encode('utf-8')})
+
+async def _wait_for_ocr_job(scope):
+    # Long poll: hold the request on the loop until the job finishes or the wait runs out
+    match = OCR_JOB_PATH_RE.fullmatch(scope['path'])
+    wait = parse_qs(scope['query_string'].decode('latin-1')).get('wait')
+    if scope['method'] != 'GET' or match is None or not wait:
+        return
+    try:
+        timeout = min(max(float(wait[0]), 0.0), OCR_WAIT_MAX)
+    except ValueError:
+        return
+
+    future = running_ocr_job(match['job_id'])
+    if future is None or timeout == 0:
+        return
+    try:
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+    except asyncio.TimeoutError:
+        pass
+    except Exception:
+        # The job failed; its row says why
+        pass
+
+async def _http(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    if aio.event_loop() is None:
+        # Servers without lifespan support
+        aio.start(loop)
+
+    try:
+        body = await _read_body(receive, app.config.get('MAX_CONTENT_LENGTH'))
+    except _RequestTooLarge:
+        await _send_text(send, 413, "Request entity too large")
+        return
+    if body is None:
+        return
+
+    await _wait_for_ocr_job(scope)
+
+    queue = asyncio.Queue(maxsize=_RESPONSE_QUEUE_SIZE)
+    client_gone = threading.Event()
+    aio.run_view(_run_view, _environ(scope, body), loop, queue, client_gone)
+    sending = asyncio.ensure_future(_send_response(send, queue))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await asyncio.wait({sending, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        if sending.done():
+            sending.result()
+    except Exception:
+        logging.info("Client went away during %s %s", scope['method'], scope['path'], exc_info=True)
+    finally:
+        sending.cancel()
+        disconnect.cancel()
+        # Stop the view, and free the queue so a hand-off already waiting on it returns
+        client_gone.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+async def _send_response(send, queue):
+    while True:
+        start, chunk, more = await queue.get()
+        if start is not None:
+            await send({'type': 'http.response.start', 'status': start[0], 'headers': start[1]})
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+        if not more:
+            return
+
+async def _wait_for_disconnect(receive):
+    # The body has been read, so the next message is the client going away
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            aio.start(asyncio.get_running_loop())
+            await aio.offload(init_db)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if 'url_ingest' in sys.modules:
+                await sys.modules['url_ingest'].close_async_client()
+            await aio.offload(flush_question_stats)
+            ocr_pool.shutdown()
+            aio.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        await _http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
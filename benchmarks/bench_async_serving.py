@@ -0,0 +1,161 @@
+# Load test of the serving modes: plain WSGI versus the ASGI bridge in asgi.py.
+#
+# Usage: python benchmarks/bench_async_serving.py [--bank 10000] [--requests 400] [--url-requests 64]
+#                                                [--concurrency 1 8 32] [--page-delay-ms 200]
+#
+# Requests are driven in-process, without sockets, so only the serving
+# model differs. 'wsgi' calls the Flask app from a pool with one thread per
+# concurrent client, like a threaded WSGI server. 'asgi' sends the same
+# requests through asgi.application from that many concurrent tasks. The
+# routes are /start_quiz, /manage_questions and /process_url, with the
+# last one fetching three pages each from a local server that answers
+# after --page-delay-ms. Reports requests/sec per route, mode and
+# concurrency.
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from bench_question_loader import seed
+
+QUESTION_PAGE = ''.join(
+    f'<div class="card"><div class="question_text">Question {i}?</div>'
+    f'<ul class="choices-list"><li>A. one</li><li>B. two</li><li>C. three</li></ul></div>'
+    for i in range(20)
+).encode()
+
+def start_page_server(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(QUESTION_PAGE)))
+            self.end_headers()
+            self.wfile.write(QUESTION_PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_requests(page_server):
+    base = f"http://127.0.0.1:{page_server.server_port}"
+    form = urlencode({'url': f"{base}/questions?page={{page}}", 'max_pages': 3}).encode()
+    return {
+        '/start_quiz': ('GET', '/start_quiz', b''),
+        '/manage_questions': ('GET', '/manage_questions', b''),
+        '/process_url': ('POST', '/process_url', form),
+    }
+
+def wsgi_call(app, method, path, body):
+    environ = {
+        'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded', 'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = []
+    response = app(environ, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    assert status[0].startswith(('200', '302')), status[0]
+
+def run_wsgi(app, request, total, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: wsgi_call(app, *request), range(total)))
+    return total / (time.perf_counter() - start)
+
+async def asgi_call(application, method, path, body):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    statuses = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Like a server, nothing more arrives until the client goes away
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+             'headers': [(b'content-type', b'application/x-www-form-urlencoded'),
+                         (b'content-length', str(len(body)).encode())]}
+    await application(scope, receive, send)
+    assert statuses[0] in (200, 302), statuses[0]
+
+async def run_asgi(application, request, total, concurrency):
+    remaining = iter(range(total))
+
+    async def client():
+        for _ in remaining:
+            await asgi_call(application, *request)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bank', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--url-requests', type=int, default=64, help='requests sent to /process_url')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--page-delay-ms', type=float, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        seed(args.bank)
+
+        import aio
+        import asgi
+        from app import app
+
+        page_server = start_page_server(args.page_delay_ms / 1000)
+        requests = make_requests(page_server)
+
+        async def serve_asgi(request, total, concurrency):
+            aio.start(asyncio.get_running_loop())
+            try:
+                return await run_asgi(asgi.application, request, total, concurrency)
+            finally:
+                # The async HTTP client belongs to this loop
+                if 'url_ingest' in sys.modules:
+                    await sys.modules['url_ingest'].close_async_client()
+                aio.stop()
+
+        print(f"{'route':>18} {'clients':>8} {'wsgi (req/s)':>13} {'asgi (req/s)':>13}")
+        for name, request in requests.items():
+            total = args.url_requests if name == '/process_url' else args.requests
+            for concurrency in args.concurrency:
+                wsgi_rate = run_wsgi(app, request, total, concurrency)
+                asgi_rate = asyncio.run(serve_asgi(request, total, concurrency))
+                print(f"{name:>18} {concurrency:>8} {wsgi_rate:>13.1f} {asgi_rate:>13.1f}")
+
+        page_server.shutdown()
+        database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
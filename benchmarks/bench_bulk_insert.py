@@ -0,0 +1,51 @@
+# Rows/sec for saving an import: insert_question per question (one transaction
+# and commit each) versus insert_questions (one transaction for the batch).
+#
+# Usage: python benchmarks/bench_bulk_insert.py [--questions 500]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+def make_questions(count):
+    return [{
+        'question': f"Imported question {i}?",
+        'correct_answer': "A. first",
+        'choices': ["A. first", "B. second", "C. third", "D. fourth"],
+        'multiple_selection': False,
+    } for i in range(count)]
+
+def one_by_one(questions):
+    for item in questions:
+        database.insert_question(item['question'], item['correct_answer'], item['choices'], item['multiple_selection'])
+
+def bulk(questions):
+    database.insert_questions(questions)
+
+def run(label, func, questions):
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        start = time.perf_counter()
+        func(questions)
+        elapsed = time.perf_counter() - start
+        database.close_all_connections()
+    print(f"{label:>12}: {len(questions) / elapsed:10.0f} questions/sec")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=500)
+    args = parser.parse_args()
+
+    questions = make_questions(args.questions)
+    before = run('one by one', one_by_one, questions)
+    after = run('bulk', bulk, questions)
+    print(f"{'speedup':>12}: {before / after:10.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Compare the old connect-per-call pattern with the pooled connection layer.
+#
+# Usage: python benchmarks/bench_db_pool.py [--questions N] [--requests N]
+#
+# Each simulated request does what /edit_question + /submit_quiz do against the
+# database: read one question with its choices and append a quiz_history row.
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+def seed(num_questions):
+    for i in range(num_questions):
+        database.insert_question(f"Question {i}", "A", ["A", "B", "C", "D"], False)
+
+def unpooled_request(question_id):
+    # The pattern every database.py function used before pooling
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
+    cursor.execute('SELECT * FROM choices WHERE question_id = ?', (question_id,)).fetchall()
+    conn.close()
+
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("INSERT INTO quiz_history (date_taken, correct_answers, total_questions) "
+                 "VALUES (datetime('now'), ?, ?)", (1, 1))
+    conn.commit()
+    conn.close()
+
+def pooled_request(question_id):
+    database.fetch_question_by_id(question_id)
+    database.insert_quiz_history(1, 1)
+
+def run(label, handler, num_questions, num_requests):
+    ids = [random.randint(1, num_questions) for _ in range(num_requests)]
+    start = time.perf_counter()
+    for question_id in ids:
+        handler(question_id)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>10}: {num_requests / elapsed:10.1f} requests/sec")
+    return num_requests / elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        seed(args.questions)
+
+        before = run('unpooled', unpooled_request, args.questions, args.requests)
+        after = run('pooled', pooled_request, args.questions, args.requests)
+        print(f"{'speedup':>10}: {after / before:10.2f}x")
+
+        database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Lookup benchmark for near-duplicate detection at ingest.
+#
+# Usage: python benchmarks/bench_duplicates.py [--sizes 10000 50000] [--lookups 500]
+#
+# Seeds a bank of random questions, then times find_duplicate_question for
+# noisy copies of stored questions (should match) and for new questions
+# (should not), and reports how many of the noisy copies were caught.
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+# Random words; a vocabulary like "term1", "term2" would share most shingles
+VOCABULARY = [''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 10))) for _ in range(5000)]
+NOISE = 'lI1oO0 .,'
+
+def random_question():
+    return {
+        'question': ' '.join(random.choices(VOCABULARY, k=random.randint(10, 25))) + '?',
+        'correct_answer': 'A',
+        'choices': [f"{label}. " + ' '.join(random.choices(VOCABULARY, k=random.randint(1, 5))) for label in "ABCD"],
+    }
+
+def with_ocr_noise(text, errors=2):
+    # Swap a few characters for ones OCR commonly confuses
+    chars = list(text)
+    for _ in range(errors):
+        chars[random.randrange(len(chars))] = random.choice(NOISE)
+    return ''.join(chars)
+
+def timed_lookups(questions):
+    found = 0
+    start = time.perf_counter()
+    for question in questions:
+        if database.find_duplicate_question(question['question'], question['choices']) is not None:
+            found += 1
+    return (time.perf_counter() - start) * 1000 / len(questions), found
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--lookups', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'questions':>10} {'insert (s)':>11} {'noisy (ms)':>11} {'caught':>8} {'new (ms)':>9} {'false hits':>11}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = os.path.join(tmp, 'bench.db')
+            database.init_db()
+
+            bank = [random_question() for _ in range(size)]
+            start = time.perf_counter()
+            database.insert_questions(bank)
+            insert = time.perf_counter() - start
+
+            noisy = [dict(question, question=with_ocr_noise(question['question']))
+                     for question in random.sample(bank, args.lookups)]
+            noisy_ms, caught = timed_lookups(noisy)
+            new_ms, false_hits = timed_lookups([random_question() for _ in range(args.lookups)])
+            print(f"{size:>10} {insert:>11.2f} {noisy_ms:>11.2f} {caught / args.lookups:>8.1%} {new_ms:>9.2f} {false_hits:>11}")
+
+            database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
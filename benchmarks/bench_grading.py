@@ -0,0 +1,74 @@
+# Throughput benchmark for quiz grading.
+#
+# Usage: python benchmarks/bench_grading.py [--submissions 5000] [--quiz-length 40]
+#
+# Grades random 40-question submissions with grading.grade_submission (answer
+# masks compiled once, as the question cache does) against the old per-submit
+# string comparison, and reports submissions graded per second.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from grading import compile_answer_mask, grade_submission
+
+def make_question(question_id):
+    choices = [f"Choice {question_id}-{index}, option text" for index in range(random.randint(4, 5))]
+    multiple = random.random() < 0.2
+    correct = sorted(random.sample(range(len(choices)), 2 if multiple else 1))
+    return {
+        'id': question_id,
+        'question': f"Question {question_id}",
+        'choices': choices,
+        'multiple_selection': multiple,
+        'correct_answer': ', '.join(choices[index] for index in correct),
+    }
+
+def legacy_grade(questions, answers):
+    # The string comparison submit_quiz used before (answers carry choice texts)
+    total_correct = 0
+    correct_answers = {}
+    for question in questions:
+        user_answer = answers.get(f'answer_{question["id"]}')
+        if ", ".join(user_answer or []) == question['correct_answer']:
+            total_correct += 1
+            correct_answers[question['id']] = 'correct'
+        else:
+            correct_answers[question['id']] = 'wrong'
+    return correct_answers, total_correct
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submissions', type=int, default=5000)
+    parser.add_argument('--quiz-length', type=int, default=40)
+    args = parser.parse_args()
+
+    questions = [make_question(question_id) for question_id in range(1, args.quiz_length + 1)]
+    for question in questions:
+        question['answer_mask'] = compile_answer_mask(question['correct_answer'], question['choices'])
+
+    submissions = []
+    for _ in range(args.submissions):
+        answers = {}
+        for question in questions:
+            picks = random.sample(range(len(question['choices'])), 2 if question['multiple_selection'] else 1)
+            answers[f"answer_{question['id']}"] = [str(index) for index in picks]
+        submissions.append(answers)
+    text_submissions = [{key: [questions[int(key.split('_')[1]) - 1]['choices'][int(value)] for value in values]
+                         for key, values in answers.items()} for answers in submissions]
+
+    for label, grade, batch in (
+        ('string compare', legacy_grade, text_submissions),
+        ('masks', lambda qs, answers: grade_submission(qs, answers), submissions),
+        ('masks + partial', lambda qs, answers: grade_submission(qs, answers, partial_credit=True), submissions),
+    ):
+        start = time.perf_counter()
+        for answers in batch:
+            grade(questions, answers)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>16}: {len(batch) / elapsed:>9.0f} submissions/sec")
+
+if __name__ == '__main__':
+    main()
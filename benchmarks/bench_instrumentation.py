@@ -0,0 +1,62 @@
+# Overhead benchmark for the request metrics in metrics.py.
+#
+# Usage: python benchmarks/bench_instrumentation.py [--lookups 20000] [--bank 5000] [--profile]
+#
+# Runs single-question lookups by id with the instrumented SQLite connection
+# (query counting and 'db' stage timing inside a request) and with a plain
+# one, and reports the per-query cost of each. --profile also runs the
+# instrumented pass with the sampling profiler on and prints its top frames.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import metrics
+from bench_question_loader import seed
+
+def run(ids, lookups, instrumented):
+    database.METRICS_ENABLED = instrumented
+    database.close_all_connections()
+    conn = database.get_connection()
+    state = metrics.start_request()
+    picks = [random.choice(ids) for _ in range(lookups)]
+
+    started = time.perf_counter()
+    for question_id in picks:
+        conn.execute('SELECT question, correct_answer FROM questions WHERE id = ?', (question_id,)).fetchone()
+    elapsed = time.perf_counter() - started
+    metrics.finish_request(state, 'bench')
+    return elapsed, state['queries']
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--bank', type=int, default=5000)
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        seed(args.bank)
+        ids = database.question_id_snapshot()[1]
+
+        for label, instrumented in (('plain', False), ('instrumented', True)):
+            elapsed, queries = run(ids, args.lookups, instrumented)
+            print(f"{label:>13}: {elapsed * 1e6 / args.lookups:6.2f} us/query, {queries} queries counted")
+
+        if args.profile:
+            metrics.profiler.start()
+            elapsed, _ = run(ids, args.lookups, True)
+            metrics.profiler.stop()
+            print(f"{'profiled':>13}: {elapsed * 1e6 / args.lookups:6.2f} us/query")
+            for entry in metrics.profiler.report(limit=5)['self']:
+                print(f"  {entry['share']:6.1%}  {entry['function']}")
+        database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Page latency benchmark for the manage_questions listing.
+#
+# Usage: python benchmarks/bench_pagination.py [--size 100000] [--page-size 100]
+#
+# Times fetch_questions_page at increasing depths against LIMIT/OFFSET paging,
+# and the peak memory of walking the whole bank with iter_questions versus
+# fetch_all_questions.
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from bench_question_loader import seed
+
+def offset_page(offset, limit):
+    # OFFSET paging has to step over every skipped row
+    cursor = database.get_connection().cursor()
+    questions = [dict(row) for row in cursor.execute('SELECT * FROM questions ORDER BY id LIMIT ? OFFSET ?', (limit, offset))]
+    return database._attach_choices(cursor, questions)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+def peak_memory(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        seed(args.size)
+
+        print(f"{'depth':>10} {'keyset (ms)':>12} {'offset (ms)':>12}")
+        for depth in (0, args.size // 10, args.size // 2, args.size - args.page_size):
+            keyset = timed(database.fetch_questions_page, depth, args.page_size)
+            offset = timed(offset_page, depth, args.page_size)
+            print(f"{depth:>10} {keyset:>12.2f} {offset:>12.2f}")
+
+        streamed = peak_memory(lambda: sum(1 for _ in database.iter_questions()))
+        loaded = peak_memory(database.fetch_all_questions)
+        print(f"peak memory, whole bank: iter_questions {streamed:.1f} MiB, fetch_all_questions {loaded:.1f} MiB")
+
+        database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
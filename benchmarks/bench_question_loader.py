@@ -0,0 +1,62 @@
+# Scaling benchmark for loading the question bank with its choices.
+#
+# Usage: python benchmarks/bench_question_loader.py [--sizes 1000 10000 100000]
+#
+# Compares the old one-query-per-question loader with the batched loader in
+# database.py for fetch_all_questions and for fetch_questions_by_ids(40 ids).
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+def seed(num_questions):
+    with database.transaction() as cursor:
+        cursor.executemany('INSERT INTO questions (question, correct_answer, multiple_selection) VALUES (?, ?, 0)',
+                           ((f"Question {i}", "A") for i in range(num_questions)))
+        cursor.executemany('INSERT INTO choices (question_id, choice_text) VALUES (?, ?)',
+                           ((question_id, f"{label}. Choice") for question_id in range(1, num_questions + 1)
+                            for label in "ABCD"))
+
+def n_plus_one_fetch_all():
+    # The loader fetch_all_questions used before batching
+    cursor = database.get_connection().cursor()
+    question_list = []
+    for question in cursor.execute('SELECT * FROM questions').fetchall():
+        question_dict = dict(question)
+        choices = cursor.execute('SELECT * FROM choices WHERE question_id = ?', (question['id'],)).fetchall()
+        question_dict['choices'] = [choice['choice_text'] for choice in choices]
+        question_list.append(question_dict)
+    return question_list
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'questions':>10} {'n+1 all (ms)':>14} {'batched all (ms)':>17} {'by 40 ids (ms)':>15}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = os.path.join(tmp, 'bench.db')
+            database.init_db()
+            seed(size)
+
+            ids = random.sample(range(1, size + 1), min(40, size))
+            old = timed(n_plus_one_fetch_all)
+            new = timed(database.fetch_all_questions)
+            by_ids = timed(database.fetch_questions_by_ids, ids)
+            print(f"{size:>10} {old:>14.1f} {new:>17.1f} {by_ids:>15.2f}")
+
+            database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Write-cost benchmark for per-question answer statistics.
+#
+# Usage: python benchmarks/bench_question_stats.py [--submissions 2000] [--bank 5000]
+#
+# Records a burst of 40-question submissions with one write transaction per
+# submission versus the coalesced buffer in question_stats.py, and reports
+# submissions/sec and the number of transactions each needed.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import question_stats
+from bench_question_loader import seed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submissions', type=int, default=2000)
+    parser.add_argument('--bank', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        seed(args.bank)
+
+        submissions = [[(question_id, float(random.random() < 0.6)) for question_id in random.sample(range(1, args.bank + 1), 40)]
+                       for _ in range(args.submissions)]
+
+        start = time.perf_counter()
+        for results in submissions:
+            now = time.time()
+            database.apply_question_stats([(question_id, 1, int(score == 1.0), now) for question_id, score in results])
+        per_submit = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for results in submissions:
+            question_stats.record_answers(results)
+        question_stats.flush_question_stats()
+        coalesced = time.perf_counter() - start
+        flushes = question_stats.question_stats_counters()['flushes']
+
+        print(f"{'per submission':>15}: {args.submissions / per_submit:>9.0f} submissions/sec, {args.submissions} transactions")
+        print(f"{'coalesced':>15}: {args.submissions / coalesced:>9.0f} submissions/sec, {flushes} transactions")
+
+        database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Quiz-start latency as the bank grows: full-bank load + random.sample versus
+# fetch_random_questions, which samples cached ids and loads only k questions.
+#
+# Usage: python benchmarks/bench_quiz_sampling.py [--sizes 1000 10000 100000] [--k 40]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from bench_question_loader import seed
+
+def old_start_quiz(k):
+    all_questions = database.fetch_all_questions()
+    return random.sample(all_questions, min(k, len(all_questions)))
+
+def mean_ms(func, *args, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--k', type=int, default=40)
+    args = parser.parse_args()
+
+    print(f"{'questions':>10} {'load all (ms)':>14} {'sampled (ms)':>13}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = os.path.join(tmp, 'bench.db')
+            database.init_db()
+            seed(size)
+
+            old = mean_ms(old_start_quiz, args.k, repeat=3)
+            database.fetch_question_ids()  # warm the id cache as a running server would
+            new = mean_ms(database.fetch_random_questions, args.k)
+            print(f"{size:>10} {old:>14.1f} {new:>13.2f}")
+
+            database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Cookie size and submit cost: cookie-stored question ids versus server-side quiz sessions.
+#
+# Usage: python benchmarks/bench_quiz_sessions.py [--lengths 40 200 1000] [--bank 20000] [--submissions 200]
+#
+# For each quiz length reports the session cookie payload of the old id list
+# (JSON, compressed and base64-encoded the way Flask's cookie session does
+# before signing) against the token that replaces it. It also times scoring a
+# submission: the old path loaded every question with a cold question cache
+# and graded it with grade_submission, the new one reads the quiz_sessions
+# row and grades from its answer key.
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import quiz_sessions
+from bench_question_loader import seed
+from grading import grade_submission
+
+def cookie_payload_size(data):
+    payload = json.dumps(data, separators=(',', ':')).encode()
+    compressed = zlib.compress(payload)
+    if len(compressed) < len(payload) - 1:
+        payload = b'.' + compressed
+    return len(base64.urlsafe_b64encode(payload).rstrip(b'='))
+
+def random_answers(ids):
+    return {f"answer_{question_id}": [str(random.randrange(4))] for question_id in ids}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lengths', type=int, nargs='+', default=[40, 200, 1000])
+    parser.add_argument('--bank', type=int, default=20000)
+    parser.add_argument('--submissions', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        seed(args.bank)
+
+        print(f"{'length':>7} {'id cookie (B)':>14} {'token cookie (B)':>17} {'old submit (ms)':>16} {'new submit (ms)':>16}")
+        for length in args.lengths:
+            quizzes = []
+            for _ in range(args.submissions):
+                ids = random.sample(range(1, args.bank + 1), length)
+                token = quiz_sessions.start_quiz_session(database.fetch_questions_by_ids(ids))
+                quizzes.append((ids, token, random_answers(ids)))
+
+            start = time.perf_counter()
+            for ids, _, answers in quizzes:
+                database.question_cache.clear()
+                grade_submission(database.fetch_questions_by_ids(ids), answers)
+            old = (time.perf_counter() - start) * 1000 / args.submissions
+
+            start = time.perf_counter()
+            for _, token, answers in quizzes:
+                quiz_sessions.grade_quiz(quiz_sessions.load_quiz_session(token), answers)
+            new = (time.perf_counter() - start) * 1000 / args.submissions
+
+            id_cookie = cookie_payload_size({'quiz_question_ids': quizzes[0][0]})
+            token_cookie = cookie_payload_size({'quiz_token': quizzes[0][1]})
+            print(f"{length:>7} {id_cookie:>14} {token_cookie:>17} {old:>16.2f} {new:>16.2f}")
+
+        database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Benchmark for the quiz report after years of history.
+#
+# Usage: python benchmarks/bench_report.py [--sizes 10000 100000]
+#
+# Fills quiz_history with quizzes spread over three years, then times the old
+# report computation (every row fetched, dates parsed with strptime,
+# percentages in Python) against fetch_history_rollup for daily and weekly
+# periods, and a history page read from the date_taken index.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+def old_report():
+    cursor = database.get_connection().cursor()
+    history = cursor.execute('SELECT * FROM quiz_history ORDER BY date_taken DESC').fetchall()
+    scores = [(entry['correct_answers'] / entry['total_questions']) * 100 for entry in history]
+    dates = [datetime.strptime(entry['date_taken'], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M') for entry in history]
+    return dates, scores
+
+def timed_ms(func, *args, rounds=10):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'quizzes':>8} {'old (ms)':>9} {'daily (ms)':>11} {'weekly (ms)':>12} {'history page (ms)':>18}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = os.path.join(tmp, 'bench.db')
+            database.init_db()
+
+            start = datetime(2023, 1, 1)
+            with database.transaction() as cursor:
+                cursor.executemany('INSERT INTO quiz_history (date_taken, correct_answers, total_questions) VALUES (?, ?, 40)',
+                                   (((start + timedelta(seconds=random.randint(0, 3 * 365 * 86400))).strftime('%Y-%m-%d %H:%M:%S'),
+                                     random.randint(10, 40)) for _ in range(size)))
+            # An empty rollup is rebuilt from the history by init_db
+            database.init_db()
+
+            old = timed_ms(old_report)
+            daily = timed_ms(database.fetch_history_rollup, 'daily')
+            weekly = timed_ms(database.fetch_history_rollup, 'weekly')
+            page = timed_ms(database.fetch_quiz_history, 50, ('2024-06-01 00:00:00', 0))
+            print(f"{size:>8} {old:>9.1f} {daily:>11.2f} {weekly:>12.2f} {page:>18.3f}")
+
+            database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Benchmark for building a due-review session from the spaced-repetition schedule.
+#
+# Usage: python benchmarks/bench_review_queue.py [--sizes 10000 100000] [--quiz-length 40]
+#
+# Fills review_schedule with random due times (about a tenth of them due) and
+# times fetch_due_question_ids, which walks the due_at index, against the
+# same query forced to scan and sort the table.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from bench_question_loader import seed
+
+def scan_due(now, limit):
+    cursor = database.get_connection().cursor()
+    rows = cursor.execute('SELECT question_id FROM review_schedule NOT INDEXED WHERE due_at <= ? ORDER BY due_at LIMIT ?',
+                          (now, limit))
+    return [row[0] for row in rows]
+
+def timed_ms(func, *args, rounds=50):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--quiz-length', type=int, default=40)
+    args = parser.parse_args()
+
+    print(f"{'scheduled':>10} {'indexed (ms)':>13} {'scan (ms)':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = os.path.join(tmp, 'bench.db')
+            database.init_db()
+            seed(size)
+
+            now = time.time()
+            with database.transaction() as cursor:
+                cursor.executemany('''
+                INSERT INTO review_schedule (question_id, repetitions, interval_days, ease, due_at, last_reviewed)
+                VALUES (?, 1, 6, 2.5, ?, ?)
+                ''', ((question_id, now + random.uniform(-3, 27) * 86400, now) for question_id in range(1, size + 1)))
+
+            indexed = timed_ms(database.fetch_due_question_ids, now, args.quiz_length)
+            scan = timed_ms(scan_due, now, args.quiz_length)
+            print(f"{size:>10} {indexed:>13.3f} {scan:>10.3f}")
+
+            database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Latency benchmark for the question search index.
+#
+# Usage: python benchmarks/bench_search.py [--sizes 10000 100000] [--queries 200]
+#
+# Seeds a bank, builds the FTS index through init_db's backfill and times
+# search_questions against a LIKE scan over questions and choices.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+def sentence(words):
+    return ' '.join(random.choices(VOCABULARY, k=words))
+
+def seed(num_questions):
+    # Random text over a fixed vocabulary, so each word matches a slice of the bank
+    with database.transaction() as cursor:
+        cursor.executemany('INSERT INTO questions (question, correct_answer, multiple_selection) VALUES (?, ?, 0)',
+                           ((sentence(12), "A") for _ in range(num_questions)))
+        cursor.executemany('INSERT INTO choices (question_id, choice_text) VALUES (?, ?)',
+                           ((question_id, f"{label}. {sentence(4)}") for question_id in range(1, num_questions + 1)
+                            for label in "ABCD"))
+
+def like_search(text, limit=20):
+    # Full scan the search index replaces
+    pattern = f'%{text.split()[0]}%'
+    cursor = database.get_connection().cursor()
+    return cursor.execute('''
+        SELECT DISTINCT q.id, q.question FROM questions q
+        LEFT JOIN choices c ON c.question_id = q.id
+        WHERE q.question LIKE ? OR c.choice_text LIKE ?
+        LIMIT ?
+    ''', (pattern, pattern, limit)).fetchall()
+
+def timed_queries(func, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'questions':>10} {'index (s)':>10} {'fts p50 (ms)':>13} {'fts p95 (ms)':>13} {'like p50 (ms)':>14}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = os.path.join(tmp, 'bench.db')
+            database.init_db()
+            seed(size)
+
+            # A second init_db backfills the empty index from the seeded rows
+            start = time.perf_counter()
+            database.init_db()
+            build = time.perf_counter() - start
+
+            queries = [sentence(random.randint(1, 2)) for _ in range(args.queries)]
+            fts_p50, fts_p95 = timed_queries(database.search_questions, queries)
+            like_p50, _ = timed_queries(like_search, queries[:20])
+            print(f"{size:>10} {build:>10.2f} {fts_p50:>13.2f} {fts_p95:>13.2f} {like_p50:>14.2f}")
+
+            database.close_all_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Benchmark for adaptive quiz selection on a large bank.
+#
+# Usage: python benchmarks/bench_selection.py [--size 100000] [--quiz-length 40] [--rounds 2000]
+#
+# Times drawing a quiz with the weighted Fenwick-tree sampler in selection.py
+# against uniform random.sample over the id array (the previous approach) and
+# against a naive weighted draw that rebuilds cumulative weights per request,
+# plus the cost of building the engine and of one incremental weight update.
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from selection import SelectionEngine, question_weight
+
+def naive_weighted(ids, weights, k):
+    # Rebuild cumulative weights and redraw on repeats, per request
+    cumulative = list(itertools.accumulate(weights))
+    picked = set()
+    while len(picked) < k:
+        picked.update(random.choices(ids, cum_weights=cumulative, k=k - len(picked)))
+    return list(picked)
+
+def per_call_ms(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) * 1000 / rounds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--quiz-length', type=int, default=40)
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    ids = array('q', range(1, args.size + 1))
+    now = time.time()
+    answer_counts = {}
+    for question_id in random.sample(range(1, args.size + 1), args.size // 2):
+        attempts = random.randint(1, 10)
+        answer_counts[question_id] = (attempts, random.randint(0, attempts), now - random.uniform(0, 7 * 86400))
+
+    start = time.perf_counter()
+    engine = SelectionEngine(ids, answer_counts, now=now)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    weights = [question_weight(*answer_counts.get(question_id, (0, 0, None))[:2], False) for question_id in ids]
+    k = args.quiz_length
+    results = [(question_id, float(random.random() < 0.5)) for question_id in random.sample(range(1, args.size + 1), k)]
+
+    print(f"bank of {args.size} questions, quizzes of {k}")
+    print(f"{'engine build (once)':>28}: {build_ms:>9.1f} ms")
+    print(f"{'uniform random.sample':>28}: {per_call_ms(lambda: random.sample(ids, k), args.rounds):>9.3f} ms/quiz")
+    print(f"{'weighted, Fenwick tree':>28}: {per_call_ms(lambda: engine.sample(k), args.rounds):>9.3f} ms/quiz")
+    print(f"{'weighted, rebuilt per quiz':>28}: {per_call_ms(lambda: naive_weighted(ids, weights, k), 20):>9.3f} ms/quiz")
+    print(f"{'update after a submission':>28}: {per_call_ms(lambda: engine.record_results(results), args.rounds):>9.3f} ms")
+
+if __name__ == '__main__':
+    main()
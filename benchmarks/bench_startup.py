@@ -0,0 +1,60 @@
+# Startup cost of a web worker: import time and resident memory of app.py.
+#
+# Usage: python benchmarks/bench_startup.py [--runs 5] [--module app]
+#
+# Each run imports the module in a fresh interpreter. 'eager' first imports
+# the ingestion libraries app.py used to load at module level (OpenCV,
+# NumPy, Tesseract, PIL, BeautifulSoup, requests), 'lazy' is the current
+# import and 'quiz-only' the same with QUIZ_ONLY=1. Reports the median
+# import time, the peak RSS and which ingestion libraries ended up loaded.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INGESTION_MODULES = ('cv2', 'numpy', 'pytesseract', 'PIL', 'bs4', 'requests')
+
+CHILD = '''
+import json, resource, sys, time
+start = time.perf_counter()
+if {eager}:
+    for name in {modules!r}:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'import_ms': elapsed * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': [name for name in {modules!r} if name in sys.modules],
+}}))
+'''
+
+def run(module, eager, quiz_only):
+    env = dict(os.environ, QUIZ_ONLY='1' if quiz_only else '0')
+    code = CHILD.format(eager=eager, modules=INGESTION_MODULES, module=module)
+    output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--module', default='app')
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'import (ms)':>12} {'peak RSS (MB)':>14}  ingestion libraries loaded")
+    for label, eager, quiz_only in (('eager', True, False), ('lazy', False, False), ('quiz-only', False, True)):
+        results = [run(args.module, eager, quiz_only) for _ in range(args.runs)]
+        import_ms = statistics.median(result['import_ms'] for result in results)
+        rss_mb = statistics.median(result['rss_mb'] for result in results)
+        loaded = ', '.join(results[0]['loaded']) or 'none'
+        print(f"{label:>10} {import_ms:>12.1f} {rss_mb:>14.1f}  {loaded}")
+
+if __name__ == '__main__':
+    main()
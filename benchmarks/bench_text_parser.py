@@ -0,0 +1,75 @@
+# Time and peak memory of parsing a pasted question dump: the old re.split
+# process_text logic versus the streaming question_parser.iter_text_questions.
+#
+# Usage: python benchmarks/bench_text_parser.py [--sizes 1000 10000 50000]
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from question_parser import iter_text_questions
+
+def make_dump(num_questions):
+    blocks = []
+    for i in range(1, num_questions + 1):
+        blocks.append(
+            f"Question {i} ( Single Topic )\n"
+            f"Which service should be used for scenario number {i}?\n"
+            "A. The first option\nB. The second option\nC. The third option\nD. The fourth option\n"
+            f"Answer : {'ABCD'[i % 4]}\n"
+        )
+    return "\n".join(blocks)
+
+def old_process_text(raw_text):
+    # The parsing part of process_text before the streaming parser
+    question_blocks = re.split(r'(Question \d+ \( Single Topic \))', raw_text)
+    questions = []
+    for i in range(1, len(question_blocks), 2):
+        question_body = question_blocks[i + 1].strip()
+        question_content_match = re.search(r'^(.+?)(?=A\.)', question_body, re.DOTALL)
+        question_content = question_content_match.group(1).strip() if question_content_match else ""
+        choices = [choice[2:].strip() for choice in re.findall(r'([A-Z]\.\s?.+)', question_body)]
+        answer_match = re.search(r'Answer :\s?([A-Z, ]+)', question_body)
+        answer_letters = answer_match.group(1).strip() if answer_match else "N/A"
+        correct_answers = []
+        if answer_letters != "N/A":
+            for answer_letter in re.findall(r'[A-Z]', answer_letters):
+                answer_index = ord(answer_letter) - ord('A')
+                if 0 <= answer_index < len(choices):
+                    correct_answers.append(choices[answer_index])
+        if question_content and len(choices) >= 2 and correct_answers:
+            questions.append({'question': question_content, 'choices': choices,
+                              'correct_answer': ", ".join(correct_answers), 'index': i // 2 + 1})
+    return len(questions)
+
+def streaming(raw_text):
+    # Consume the questions one at a time, as the streamed review page does
+    return sum(1 for _ in iter_text_questions(raw_text))
+
+def measure(func, raw_text):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func(raw_text)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed * 1000, peak / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'questions':>10} {'input MiB':>10} {'old ms':>9} {'old peak MiB':>13} {'stream ms':>10} {'stream peak MiB':>16}")
+    for size in args.sizes:
+        raw_text = make_dump(size)
+        old_count, old_ms, old_peak = measure(old_process_text, raw_text)
+        new_count, new_ms, new_peak = measure(streaming, raw_text)
+        assert old_count == new_count, (old_count, new_count)
+        print(f"{size:>10} {len(raw_text) / 1024 / 1024:>10.1f} {old_ms:>9.1f} {old_peak:>13.2f} {new_ms:>10.1f} {new_peak:>16.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Peak memory of decoding and preprocessing one screenshot: the old
+# save-to-disk + PIL/NumPy round-trip path versus in-memory decoding.
+#
+# Usage: python benchmarks/bench_upload_memory.py [--width 1920] [--height 1080]
+#
+# Tesseract is not run; both paths stop at the array that would be handed to it.
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr import decode_image, preprocess_image
+
+def make_screenshot(width, height):
+    # A synthetic exam page: dark text lines on a light background, saved as PNG
+    image = Image.new('RGB', (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    for i, y in enumerate(range(20, height - 20, 28)):
+        label = "Question 1 ( Single Topic )" if i % 6 == 0 else f"{'ABCD'[i % 4]}. Sample answer text {i}"
+        draw.text((20, y), label, fill=(20, 20, 20))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def old_path(data, tmp):
+    # What process_image used to do: save, reopen with PIL, convert to NumPy and back
+    file_path = os.path.join(tmp, 'upload.png')
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    image = Image.open(file_path)
+    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+    _, binary_image = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    denoised_image = cv2.fastNlMeansDenoising(binary_image, None, 30, 7, 21)
+    kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+    sharpened = Image.fromarray(cv2.filter2D(denoised_image, -1, kernel))
+    result = np.array(sharpened)  # pytesseract converted the PIL image again
+    os.remove(file_path)
+    return result
+
+def new_path(data, tmp):
+    return preprocess_image(decode_image(data))
+
+def measure(label, func, data, tmp):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(data, tmp)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>10}: peak {peak / 1024 / 1024:8.2f} MiB, {elapsed * 1000:8.1f} ms")
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+
+    data = make_screenshot(args.width, args.height)
+    print(f"screenshot: {args.width}x{args.height}, {len(data) / 1024:.0f} KiB PNG")
+    with tempfile.TemporaryDirectory() as tmp:
+        before = measure('old', old_path, data, tmp)
+        after = measure('in-memory', new_path, data, tmp)
+    print(f"{'saved':>10}: {(before - after) / 1024 / 1024:8.2f} MiB ({100 * (1 - after / before):.0f}%)")
+
+if __name__ == '__main__':
+    main()
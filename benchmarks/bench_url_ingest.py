@@ -0,0 +1,108 @@
+# URL ingestion against a local stand-in question site.
+#
+# Usage: python benchmarks/bench_url_ingest.py [--pages 40] [--latency 0.05]
+#
+# Serves numbered div.card pages with ETag headers and a fixed response delay,
+# then compares the old one-request-at-a-time fetch with ingest_urls, first cold
+# and then warm (every page revalidated with a 304).
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import url_ingest
+
+QUESTIONS_PER_PAGE = 10
+
+def render_page(page):
+    cards = []
+    for i in range(QUESTIONS_PER_PAGE):
+        cards.append(f'''
+        <div class="card">
+            <div class="question_text">Page {page} question {i}?</div>
+            <ul class="choices-list"><li>A. one</li><li>B. two</li><li>C. three</li><li>D. four</li></ul>
+        </div>''')
+    return f"<html><body>{''.join(cards)}</body></html>".encode()
+
+class QuestionSiteHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+
+    def do_GET(self):
+        page = int(self.path.rstrip('/').rsplit('/', 1)[-1])
+        body = render_page(page)
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+        time.sleep(self.latency)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def old_ingest(urls):
+    # What process_url did: a bare requests.get and html.parser per URL, one at a time
+    questions = []
+    for url in urls:
+        response = requests.get(url)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, 'html.parser')
+        for card in soup.find_all('div', class_='card'):
+            choices = [li.get_text(strip=True) for li in card.find('ul', class_='choices-list').find_all('li')]
+            questions.append({'question': card.find('div', class_='question_text').get_text(strip=True),
+                              'choices': choices})
+    return questions
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    questions = result[0] if isinstance(result, tuple) else result
+    print(f"{label:>22}: {elapsed * 1000:8.1f} ms, {len(questions)} questions")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    QuestionSiteHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), QuestionSiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    template = f"http://127.0.0.1:{server.server_port}/page/{{page}}"
+    urls = [template.replace('{page}', str(page)) for page in range(1, args.pages + 1)]
+
+    url_ingest.URL_MAX_PAGES = max(url_ingest.URL_MAX_PAGES, args.pages)
+    print(f"parser: {url_ingest.HTML_PARSER}, {args.pages} pages, {args.latency * 1000:.0f} ms latency")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+
+        timed('sequential', old_ingest, urls)
+        timed('concurrent (cold)', url_ingest.ingest_urls, [template], args.pages)
+        timed('concurrent (304s)', url_ingest.ingest_urls, [template], args.pages)
+
+        database.close_all_connections()
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
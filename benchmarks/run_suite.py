@@ -0,0 +1,309 @@
+# Regression benchmark suite: ingestion, quiz flow, reporting and parsing.
+#
+# Usage: python benchmarks/run_suite.py [--sizes 1000 10000 100000] [--repeat 20]
+#                                       [--sections db routes parsers ocr]
+#                                       [--output results.json] [--compare baseline.json]
+#
+# For each bank size a synthetic bank (plus three years of quiz history) is
+# seeded into a temp DB. The database.py functions are timed directly and
+# /start_quiz, /submit_quiz, /manage_questions, /process_text and
+# /generate_report through Flask's test client. The text parsers and the OCR
+# preprocessing of generated page images are timed once, independent of the
+# bank size. Every case reports min/median/p95/mean in milliseconds and the
+# whole run is written as JSON; --compare prints the median change against
+# an earlier run and exits non-zero when a case slowed down past --threshold.
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from question_parser import extract_questions_and_choices, iter_text_questions
+from quiz_sessions import load_quiz_session
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECTIONS = ('db', 'routes', 'parsers', 'ocr')
+
+# Random-letter words, so searches and duplicate lookups hit realistic slices of the bank
+_words = random.Random(0)
+VOCABULARY = [''.join(_words.choices(string.ascii_lowercase, k=_words.randint(3, 9))) for _ in range(5000)]
+
+def sentence(words):
+    return ' '.join(random.choices(VOCABULARY, k=words))
+
+def make_question(index):
+    return {
+        'question': f"{sentence(12)} ({index})?",
+        'choices': [f"{label}. {sentence(4)}" for label in "ABCD"],
+        'correct_answer': random.choice("ABCD"),
+    }
+
+def seed_bank(num_questions, num_quizzes):
+    with database.transaction() as cursor:
+        cursor.executemany('INSERT INTO questions (question, correct_answer, multiple_selection) VALUES (?, ?, 0)',
+                           ((f"{sentence(12)} ({i})?", "A") for i in range(num_questions)))
+        cursor.executemany('INSERT INTO choices (question_id, choice_text) VALUES (?, ?)',
+                           ((question_id, f"{label}. {sentence(4)}") for question_id in range(1, num_questions + 1)
+                            for label in "ABCD"))
+        start = datetime(2023, 1, 1)
+        cursor.executemany('INSERT INTO quiz_history (date_taken, correct_answers, total_questions) VALUES (?, ?, 40)',
+                           (((start + timedelta(seconds=random.randint(0, 3 * 365 * 86400))).strftime('%Y-%m-%d %H:%M:%S'),
+                             random.randint(10, 40)) for _ in range(num_quizzes)))
+    # Search index, fingerprints and history rollups are backfilled by init_db
+    database.init_db()
+
+def make_dump(num_questions):
+    # The pasted-dump layout handled by process_text
+    return "\n".join(
+        f"Question {i} ( Single Topic )\n{sentence(14)}?\n"
+        + "".join(f"{label}. {sentence(5)}\n" for label in "ABCD")
+        + f"Answer : {'ABCD'[i % 4]}\n"
+        for i in range(1, num_questions + 1)
+    )
+
+def make_ocr_text(num_questions):
+    # Text as it comes out of Tesseract for screenshots: question text over
+    # several lines and the page's 'Next Question' button
+    return "\n".join(
+        f"Question{i} ( Single Topic )\n{sentence(8)}\n{sentence(6)}?\n"
+        + "".join(f"{label}.{sentence(5)}\n" for label in "ABCD")
+        + f"Answer: {'ABCD'[i % 4]}\nNext Question\n"
+        for i in range(1, num_questions + 1)
+    )
+
+def measure(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(timings[0], 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        'mean_ms': round(statistics.fmean(timings), 4),
+    }
+
+def db_cases(size):
+    ids = database.question_id_snapshot()[1]
+    existing = database.fetch_questions_by_ids(random.sample(list(ids), min(200, len(ids))))
+    counter = iter(range(size + 1, 10 ** 9))
+
+    def find_duplicate():
+        question = random.choice(existing)
+        database.find_duplicate_question(question['question'], question['choices'])
+
+    def insert_batch():
+        inserted_ids, errors = database.insert_questions([make_question(next(counter)) for _ in range(100)])
+        assert len(inserted_ids) == 100, errors[:3]
+
+    return {
+        'fetch_random_questions': lambda: database.fetch_random_questions(40),
+        'fetch_questions_by_ids': lambda: database.fetch_questions_by_ids(random.sample(list(ids), min(40, len(ids)))),
+        'fetch_questions_page': lambda: database.fetch_questions_page(after_id=random.randrange(size), limit=100),
+        'search_questions': lambda: database.search_questions(random.choice(VOCABULARY)),
+        'find_duplicate_question': find_duplicate,
+        'insert_questions_100': insert_batch,
+        'insert_quiz_history': lambda: database.insert_quiz_history(random.randint(10, 40), 40),
+        'fetch_quiz_history': lambda: database.fetch_quiz_history(50),
+        'fetch_history_rollup_daily': lambda: database.fetch_history_rollup('daily'),
+        'fetch_history_rollup_weekly': lambda: database.fetch_history_rollup('weekly'),
+    }
+
+def route_cases(app_module, dump):
+    client = app_module.app.test_client()
+
+    def start_quiz():
+        response = client.get('/start_quiz')
+        assert response.status_code == 200, response.status_code
+
+    def submit_quiz():
+        # A fresh quiz each run, so the session holds questions to grade
+        client.get('/start_quiz')
+        with client.session_transaction() as cookie_session:
+            quiz = load_quiz_session(cookie_session['quiz_token'])
+        question_ids = quiz['question_ids']
+        answers = {f"answer_{question_id}": str(random.randrange(4)) for question_id in question_ids}
+        response = client.post('/submit_quiz', data=answers)
+        assert response.status_code == 200, response.status_code
+
+    def get(path):
+        def run():
+            response = client.get(path)
+            response.get_data()  # streamed pages are rendered while being read
+            assert response.status_code == 200, response.status_code
+        return run
+
+    def process_text():
+        response = client.post('/process_text', data={'questionText': dump})
+        response.get_data()
+        assert response.status_code == 200, response.status_code
+
+    return {
+        'start_quiz': start_quiz,
+        'submit_quiz': submit_quiz,
+        'manage_questions': get('/manage_questions'),
+        'manage_questions_search': lambda: get(f'/manage_questions?q={random.choice(VOCABULARY)}')(),
+        'process_text_100': process_text,
+        'generate_report': get('/generate_report'),
+    }
+
+def parser_cases(num_questions):
+    dump = make_dump(num_questions)
+    ocr_text = make_ocr_text(num_questions)
+    return {
+        f'iter_text_questions_{num_questions}': lambda: sum(1 for _ in iter_text_questions(dump)),
+        f'extract_questions_and_choices_{num_questions}': lambda: extract_questions_and_choices(ocr_text),
+    }
+
+def ocr_cases(num_questions):
+    import cv2
+    import numpy as np
+    import ocr
+
+    # A white page with a question and its choices drawn on it, plus scanner-like noise
+    page = np.full((900, 1400), 255, dtype=np.uint8)
+    lines = [sentence(10) for _ in range(12)]
+    for row, text in enumerate(lines):
+        cv2.putText(page, text, (40, 60 + row * 65), cv2.FONT_HERSHEY_SIMPLEX, 1.1, 0, 2)
+    noise = np.random.default_rng(0).integers(0, 40, page.shape, dtype=np.uint8)
+    page = cv2.subtract(page, noise)
+    encoded = cv2.imencode('.png', page)[1].tobytes()
+    gray = ocr.decode_image(encoded)
+    squashed = make_ocr_text(num_questions).replace(". ", ".").replace(" (", "(")
+
+    return {
+        'decode_image_png': lambda: ocr.decode_image(encoded),
+        'preprocess_image': lambda: ocr.preprocess_image(gray),
+        f'correct_spacing_{num_questions}': lambda: ocr.correct_spacing(squashed),
+    }
+
+def run_cases(cases, repeat, results, prefix):
+    for name, func in cases.items():
+        key = f"{prefix}.{name}"
+        results[key] = measure(func, repeat)
+        print(f"  {key:<45} median {results[key]['median_ms']:>10.3f} ms   p95 {results[key]['p95_ms']:>10.3f} ms")
+
+def missing_modules(*names):
+    return [name for name in names if importlib.util.find_spec(name) is None]
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+
+    print(f"\nChange against {baseline_path} (median):")
+    regressions = 0
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None or not old['median_ms']:
+            continue
+        ratio = result['median_ms'] / old['median_ms']
+        marker = '  REGRESSION' if ratio > threshold else ''
+        regressions += bool(marker)
+        print(f"  {key:<45} {old['median_ms']:>10.3f} -> {result['median_ms']:>10.3f} ms  x{ratio:.2f}{marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--quizzes', type=int, default=20000, help='quiz history rows seeded per bank')
+    parser.add_argument('--parser-questions', type=int, default=1000)
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='earlier results file to compare medians against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='median ratio reported as a regression')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = {}
+    skipped = {}
+
+    app_module = None
+    if 'routes' in args.sections:
+        missing = missing_modules('flask')
+        if missing:
+            skipped['routes'] = f"missing modules: {', '.join(missing)}"
+        else:
+            import app as app_module
+            app_module.app.config['TESTING'] = True
+
+    dump = make_dump(100)
+    for size in args.sizes if {'db', 'routes'} & set(args.sections) else ():
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = os.path.join(tmp, 'bench.db')
+            database.init_db()
+            start = time.perf_counter()
+            seed_bank(size, args.quizzes)
+            print(f"{size} questions (seeded in {time.perf_counter() - start:.1f}s)")
+
+            if 'db' in args.sections:
+                run_cases(db_cases(size), args.repeat, results, f"db.{size}")
+            if app_module is not None:
+                run_cases(route_cases(app_module, dump), args.repeat, results, f"routes.{size}")
+                # Buffered answer statistics belong to this temp DB
+                from question_stats import flush_question_stats
+                flush_question_stats()
+            database.close_all_connections()
+
+    if 'parsers' in args.sections:
+        print("parsers")
+        run_cases(parser_cases(args.parser_questions), args.repeat, results, "parsers")
+
+    if 'ocr' in args.sections:
+        missing = missing_modules('cv2', 'numpy', 'pytesseract')
+        if missing:
+            skipped['ocr'] = f"missing modules: {', '.join(missing)}"
+        else:
+            print("ocr")
+            run_cases(ocr_cases(args.parser_questions), args.repeat, results, "ocr")
+
+    for section, reason in skipped.items():
+        print(f"skipped {section}: {reason}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': args.sizes,
+            'repeat': args.repeat,
+            'quizzes': args.quizzes,
+            'parser_questions': args.parser_questions,
+            'seed': args.seed,
+            'skipped': skipped,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f"wrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
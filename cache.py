@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional per-entry TTL.
+    Keeps hit/miss/eviction counters so callers can see how well it works.
+    """
+
+    def __init__(self, max_size=10000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                # Expired entries count as a miss and are dropped
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -1,195 +1,1014 @@
+import json
+import os
+import random
+import re
 import sqlite3
+import threading
+import time
+import weakref
+from array import array
+from contextlib import contextmanager
+
+from cache import LRUCache
+from fingerprint import fingerprint, band_keys, similarity, NEAR_DUPLICATE_SIMILARITY
+from grading import compile_answer_mask
+from metrics import record_query, METRICS_ENABLED
 
 DB_PATH = "quiz.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Create questions table if not exists
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS questions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        question TEXT NOT NULL,
-        correct_answer TEXT NOT NULL,
-        multiple_selection BOOLEAN NOT NULL DEFAULT 0
-    )
-    ''')
-
-    # Create choices table if not exists
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS choices (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        question_id INTEGER NOT NULL,
-        choice_text TEXT NOT NULL,
-        FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
-    )
-    ''')
-
-    # Create quiz_history table if not exists
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS quiz_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date_taken TEXT NOT NULL,
-        correct_answers INTEGER NOT NULL,
-        total_questions INTEGER NOT NULL
+# Connection tuning applied to every pooled connection
+CACHE_SIZE_KB = 16000          # negative cache_size means KiB instead of pages
+MMAP_SIZE = 256 * 1024 * 1024  # memory-map up to 256 MiB of the database file
+STATEMENT_CACHE_SIZE = 256     # prepared statements kept per connection
+BUSY_TIMEOUT = 5.0             # seconds to wait on a locked database
+MAX_SQL_VARIABLES = 900        # stay under SQLITE_MAX_VARIABLE_NUMBER on older builds
+QUESTION_ID_CACHE_TTL = 30.0   # seconds before the cached id list is reloaded (catches other processes' writes)
+QUESTION_CACHE_SIZE = 20000    # hydrated questions kept in memory
+QUESTION_CACHE_TTL = 300.0     # seconds a cached question is trusted without re-reading
+SEARCH_SNIPPET_TOKENS = 12     # words of context around each search match
+
+# Markers wrapped around matched words in search snippets (escaped and replaced by the caller)
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+# One connection per worker thread, reused across requests. A thread's
+# connection is closed when the thread exits: its _ThreadConnection is only
+# referenced from _local, and dropping it runs a finalizer. _pool tracks the
+# open connections weakly so close_all_connections can reach them.
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = weakref.WeakSet()
+_generation = 0
+
+# Compact list of all question ids used for random sampling; rebuilt when the
+# bank version changes in this process or the TTL runs out
+_bank_version = 0
+_id_cache_lock = threading.Lock()
+_id_cache = {'key': None, 'ids': array('q'), 'loaded_at': 0.0, 'version': 0}
+
+# Whether each database has the FTS5 search index, keyed by DB_PATH
+_search_index_exists = {}
+
+# Fully hydrated questions (question, choices, correct answer) keyed by (DB_PATH, id);
+# write paths invalidate entries, the TTL bounds staleness from other processes
+question_cache = LRUCache(max_size=QUESTION_CACHE_SIZE, ttl=QUESTION_CACHE_TTL)
+
+class _InstrumentedCursor(sqlite3.Cursor):
+    # Counts and times every statement for the current request's metrics
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(started)
+
+class _InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=_InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute doesn't go through cursor(), so route it explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=_InstrumentedConnection if METRICS_ENABLED else sqlite3.Connection,
     )
-    ''')
+    conn.row_factory = sqlite3.Row
 
-    conn.commit()
-    conn.close()
+    # WAL lets readers run while a writer commits; NORMAL sync is safe under WAL
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+class _ThreadConnection:
+    __slots__ = ('conn', 'key', '__weakref__')
+
+    def __init__(self, conn, key):
+        self.conn = conn
+        self.key = key
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except sqlite3.ProgrammingError:
+        pass
+
+def get_connection():
+    """
+    Return the calling thread's pooled connection, opening it on first use.
+    A connection is reopened if DB_PATH changed or the process was forked;
+    the replaced one is closed.
+    """
+    key = (DB_PATH, os.getpid(), _generation)
+    holder = getattr(_local, 'holder', None)
+    if holder is not None and holder.key == key:
+        return holder.conn
+
+    conn = _connect()
+    holder = _ThreadConnection(conn, key)
+    weakref.finalize(holder, _close_quietly, conn)
+    _local.holder = holder
+    with _pool_lock:
+        _pool.add(conn)
+    return conn
+
+@contextmanager
+def transaction():
+    """
+    Yield a cursor on the pooled connection and commit on success,
+    rolling back if the block raises.
+    """
+    conn = get_connection()
+    with conn:
+        yield conn.cursor()
+
+def close_all_connections():
+    # Close every pooled connection (e.g. at shutdown or before forking workers)
+    global _generation
+    with _pool_lock:
+        _generation += 1
+        connections = list(_pool)
+        _pool.clear()
+    for conn in connections:
+        _close_quietly(conn)
+
+def _bump_bank_version():
+    global _bank_version
+    with _id_cache_lock:
+        _bank_version += 1
 
-def insert_question(question, correct_answer, choices, multiple_selection):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def init_db():
+    with transaction() as cursor:
+        # Create questions table if not exists
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question TEXT NOT NULL,
+            correct_answer TEXT NOT NULL,
+            multiple_selection BOOLEAN NOT NULL DEFAULT 0
+        )
+        ''')
+
+        # Create choices table if not exists
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS choices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_id INTEGER NOT NULL,
+            choice_text TEXT NOT NULL,
+            FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
+        )
+        ''')
+
+        # Choices are always looked up by their question
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_choices_question_id ON choices(question_id)')
+
+        # Create quiz_history table if not exists
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date_taken TEXT NOT NULL,
+            correct_answers INTEGER NOT NULL,
+            total_questions INTEGER NOT NULL
+        )
+        ''')
+
+        # History is read newest first and by date range
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_quiz_history_date_taken ON quiz_history(date_taken)')
+
+        # Report rollups per day and per week (keyed by the week's Monday), kept
+        # up to date by insert_quiz_history
+        for table in ('quiz_history_daily', 'quiz_history_weekly'):
+            cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                period TEXT PRIMARY KEY,
+                attempts INTEGER NOT NULL,
+                percentage_sum REAL NOT NULL,
+                best REAL NOT NULL
+            )
+            ''')
+        _backfill_history_rollups(cursor)
+
+        # Background OCR jobs; shared through the database so any web worker can report on them
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ocr_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            finished_at REAL,
+            timeout REAL NOT NULL,
+            pages INTEGER NOT NULL DEFAULT 1,
+            result TEXT,
+            error TEXT
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ocr_jobs_created_at ON ocr_jobs(created_at)')
+
+        # Parsed OCR results keyed by a hash of the upload and OCR settings
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            key TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            result_size INTEGER NOT NULL,
+            upload_size INTEGER NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used_at ON ocr_cache(last_used_at)')
+
+        # Fetched question pages, revalidated with ETag / Last-Modified
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body BLOB NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_fetched_at ON http_cache(fetched_at)')
+
+        # Duplicate detection: exact hash of the normalized text, plus the
+        # MinHash signature and its LSH band keys for near matches
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS question_fingerprints (
+            question_id INTEGER PRIMARY KEY,
+            text_hash TEXT NOT NULL,
+            signature BLOB NOT NULL,
+            FOREIGN KEY (question_id) REFERENCES questions (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_question_fingerprints_text_hash ON question_fingerprints(text_hash)')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS question_fingerprint_bands (
+            band_key INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            FOREIGN KEY (question_id) REFERENCES questions (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_question_fingerprint_bands_key ON question_fingerprint_bands(band_key)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_question_fingerprint_bands_question_id ON question_fingerprint_bands(question_id)')
+
+        # Per-question answer counts, written in coalesced batches by question_stats.py
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS question_stats (
+            question_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            last_seen REAL,
+            FOREIGN KEY (question_id) REFERENCES questions (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_question_stats_accuracy ON question_stats((correct * 1.0) / attempts)')
+
+        # Spaced-repetition state per answered question; due_at orders the review queue
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS review_schedule (
+            question_id INTEGER PRIMARY KEY,
+            repetitions INTEGER NOT NULL,
+            interval_days REAL NOT NULL,
+            ease REAL NOT NULL,
+            due_at REAL NOT NULL,
+            last_reviewed REAL NOT NULL,
+            FOREIGN KEY (question_id) REFERENCES questions (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_review_schedule_due_at ON review_schedule(due_at)')
+
+        # Quizzes in progress: packed question ids and answer key, plus the question
+        # texts (JSON) for the review page, looked up by the token in the cookie
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_sessions (
+            token TEXT PRIMARY KEY,
+            question_ids BLOB NOT NULL,
+            answer_masks BLOB NOT NULL,
+            choice_counts BLOB NOT NULL,
+            questions TEXT,
+            started_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_quiz_sessions_expires_at ON quiz_sessions(expires_at)')
+        if 'questions' not in {row['name'] for row in cursor.execute('PRAGMA table_info(quiz_sessions)')}:
+            # Sessions table from before the question texts were stored
+            cursor.execute('ALTER TABLE quiz_sessions ADD COLUMN questions TEXT')
+
+        _init_search_index(cursor)
+        _backfill_fingerprints(cursor)
+
+def _init_search_index(cursor):
+    """
+    Create the full-text index over question and choice texts (rowid is the
+    question id) and fill it from existing questions the first time.
+    """
+    try:
+        cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS question_search USING fts5(
+            question, choices, tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; search falls back to LIKE scans
+        _search_index_exists[DB_PATH] = False
+        return
+
+    _search_index_exists[DB_PATH] = True
+    if cursor.execute('SELECT 1 FROM question_search LIMIT 1').fetchone() is None:
+        cursor.execute('''
+        INSERT INTO question_search (rowid, question, choices)
+        SELECT q.id, q.question, COALESCE((SELECT group_concat(c.choice_text, char(10))
+                                           FROM choices c WHERE c.question_id = q.id), '')
+        FROM questions q
+        ''')
+
+def _has_search_index(cursor):
+    # Workers that never ran init_db look the index up once per database
+    exists = _search_index_exists.get(DB_PATH)
+    if exists is None:
+        exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'question_search'").fetchone() is not None
+        _search_index_exists[DB_PATH] = exists
+    return exists
+
+def _index_questions(cursor, rows):
+    # Add or replace search entries; rows are (question_id, question_text, choices)
+    if not _has_search_index(cursor):
+        return
+    cursor.executemany('DELETE FROM question_search WHERE rowid = ?', [(row[0],) for row in rows])
+    cursor.executemany('INSERT INTO question_search (rowid, question, choices) VALUES (?, ?, ?)',
+                       [(question_id, question, '\n'.join(choices)) for question_id, question, choices in rows])
+
+def _backfill_fingerprints(cursor):
+    # Fingerprint questions stored before duplicate detection existed
+    rows = cursor.execute('''
+    SELECT q.id, q.question FROM questions q
+    WHERE NOT EXISTS (SELECT 1 FROM question_fingerprints f WHERE f.question_id = q.id)
+    ''').fetchall()
+    if not rows:
+        return
+    questions = _attach_choices(cursor, [{'id': row['id'], 'question': row['question']} for row in rows])
+    _store_fingerprints(cursor, [(question['id'], fingerprint(question['question'], question['choices']))
+                                 for question in questions])
+
+def _store_fingerprints(cursor, rows):
+    # Add or replace fingerprints; rows are (question_id, (text_hash, signature))
+    question_ids = [(question_id,) for question_id, _ in rows]
+    cursor.executemany('DELETE FROM question_fingerprint_bands WHERE question_id = ?', question_ids)
+    cursor.executemany('INSERT OR REPLACE INTO question_fingerprints (question_id, text_hash, signature) VALUES (?, ?, ?)',
+                       [(question_id, text_hash, signature.tobytes()) for question_id, (text_hash, signature) in rows])
+    cursor.executemany('INSERT INTO question_fingerprint_bands (band_key, question_id) VALUES (?, ?)',
+                       [(key, question_id) for question_id, (_, signature) in rows for key in band_keys(signature)])
+
+def _find_duplicate(cursor, text_hash, signature):
+    """
+    Look a fingerprint up in the bank. Only questions sharing an LSH band key
+    are compared, so the cost does not grow with the size of the bank.
+    Returns {'id', 'similarity'} for the closest match, or None.
+    """
+    row = cursor.execute('SELECT question_id FROM question_fingerprints WHERE text_hash = ? LIMIT 1', (text_hash,)).fetchone()
+    if row is not None:
+        return {'id': row[0], 'similarity': 1.0}
+
+    keys = band_keys(signature)
+    placeholders = ','.join('?' for _ in keys)
+    candidates = cursor.execute(f'''
+    SELECT f.question_id, f.signature FROM question_fingerprints f
+    WHERE f.question_id IN (SELECT question_id FROM question_fingerprint_bands WHERE band_key IN ({placeholders}))
+    ''', keys).fetchall()
+
+    best = None
+    for question_id, stored in candidates:
+        score = similarity(signature, array('Q', stored))
+        if score >= NEAR_DUPLICATE_SIMILARITY and (best is None or score > best['similarity']):
+            best = {'id': question_id, 'similarity': score}
+    return best
+
+def find_duplicate_question(question, choices):
+    """Return {'id', 'similarity'} of an existing question that duplicates this one, or None."""
+    text_hash, signature = fingerprint(question, choices)
+    return _find_duplicate(get_connection().cursor(), text_hash, signature)
 
-    # Insert the question into the questions table
-    cursor.execute('''
-    INSERT INTO questions (question, correct_answer, multiple_selection)
-    VALUES (?, ?, ?)
-    ''', (question, correct_answer, multiple_selection))
+def insert_question(question, correct_answer, choices, multiple_selection):
+    with transaction() as cursor:
+        # Insert the question into the questions table
+        cursor.execute('''
+        INSERT INTO questions (question, correct_answer, multiple_selection)
+        VALUES (?, ?, ?)
+        ''', (question, correct_answer, multiple_selection))
 
-    question_id = cursor.lastrowid
+        question_id = cursor.lastrowid
 
-    # Insert the choices into the choices table
-    for choice in choices:
-        cursor.execute('''
+        # Insert the choices into the choices table
+        cursor.executemany('''
+        INSERT INTO choices (question_id, choice_text)
+        VALUES (?, ?)
+        ''', [(question_id, choice) for choice in choices])
+
+        _index_questions(cursor, [(question_id, question, choices)])
+        _store_fingerprints(cursor, [(question_id, fingerprint(question, choices))])
+
+    _bump_bank_version()
+    return question_id
+
+def validate_question(question, correct_answer, choices):
+    """Return a description of what is wrong with a question, or None if it can be saved."""
+    if not question or not question.strip():
+        return "question text is empty"
+    if not correct_answer or not correct_answer.strip():
+        return "correct answer is empty"
+    if len(choices) < 2:
+        return "at least 2 choices are required"
+    if not all(choice and choice.strip() for choice in choices):
+        return "a choice is empty"
+    return None
+
+def insert_questions(questions, skip_duplicates=False):
+    """
+    Insert many questions and their choices in a single transaction.
+    Each item is a dict with 'question', 'correct_answer', 'choices' and
+    'multiple_selection'. Invalid items are skipped and reported; with
+    skip_duplicates, so are items that duplicate a question already in the
+    bank or earlier in the batch.
+    Returns (inserted_ids, errors), errors being a list of (index, message).
+    """
+    valid = []
+    errors = []
+    for index, item in enumerate(questions):
+        error = validate_question(item.get('question'), item.get('correct_answer'), item.get('choices') or [])
+        if error:
+            errors.append((index, error))
+        else:
+            valid.append((index, item, fingerprint(item['question'], item['choices'])))
+
+    if not valid:
+        return [], errors
+
+    question_ids = []
+    inserted = []
+    with transaction() as cursor:
+        # One statement per question to learn its id, all choices in one executemany.
+        # Fingerprints are stored as we go, so repeats within the batch are caught too.
+        for index, item, question_fingerprint in valid:
+            if skip_duplicates:
+                duplicate = _find_duplicate(cursor, *question_fingerprint)
+                if duplicate is not None:
+                    kind = 'duplicate' if duplicate['similarity'] == 1.0 else 'near-duplicate'
+                    errors.append((index, f"{kind} of question #{duplicate['id']}"))
+                    continue
+
+            cursor.execute('''
+            INSERT INTO questions (question, correct_answer, multiple_selection)
+            VALUES (?, ?, ?)
+            ''', (item['question'], item['correct_answer'], bool(item.get('multiple_selection'))))
+            question_id = cursor.lastrowid
+            if skip_duplicates:
+                _store_fingerprints(cursor, [(question_id, question_fingerprint)])
+            question_ids.append(question_id)
+            inserted.append((question_id, item, question_fingerprint))
+
+        cursor.executemany('''
         INSERT INTO choices (question_id, choice_text)
         VALUES (?, ?)
-        ''', (question_id, choice))
+        ''', [(question_id, choice) for question_id, item, _ in inserted for choice in item['choices']])
+
+        _index_questions(cursor, [(question_id, item['question'], item['choices']) for question_id, item, _ in inserted])
+        if not skip_duplicates:
+            _store_fingerprints(cursor, [(question_id, question_fingerprint) for question_id, _, question_fingerprint in inserted])
+
+    errors.sort()
+    if question_ids:
+        _bump_bank_version()
+    return question_ids, errors
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _attach_choices(cursor, questions):
+    """
+    Load the choices for a list of question dicts in set-based queries and
+    store them under each dict's 'choices' key, preserving insertion order.
+    """
+    by_id = {}
+    for question in questions:
+        question['choices'] = []
+        by_id[question['id']] = question
 
-    conn.commit()
-    conn.close()
+    for chunk in _chunks(list(by_id), MAX_SQL_VARIABLES):
+        placeholders = ','.join('?' for _ in chunk)
+        cursor.execute(f'SELECT question_id, choice_text FROM choices WHERE question_id IN ({placeholders}) ORDER BY id', chunk)
+        for question_id, choice_text in cursor:
+            by_id[question_id]['choices'].append(choice_text)
 
-def fetch_all_questions():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    return questions
 
-    # Fetch all questions
-    cursor.execute('SELECT * FROM questions')
-    questions = cursor.fetchall()
+def fetch_all_questions():
+    cursor = get_connection().cursor()
 
-    question_list = []
-    
-    # Iterate over the questions and convert them to dicts to modify
+    # Fetch all questions, then every choice in one pass grouped by question
+    questions = [dict(row) for row in cursor.execute('SELECT * FROM questions ORDER BY id')]
+    by_id = {}
     for question in questions:
-        question_dict = dict(question)  # Convert to a dict to allow modifications
-        
-        # Fetch the corresponding choices for each question
-        cursor.execute('SELECT * FROM choices WHERE question_id = ?', (question['id'],))
-        choices = cursor.fetchall()
-        
-        # Add the choices to the question dict
-        question_dict['choices'] = [choice['choice_text'] for choice in choices]
-
-        # Add the updated question to the list
-        question_list.append(question_dict)
-
-    conn.close()
-    return question_list
-
-def update_question_in_db(question_id, question, correct_answer, choices, multiple_selection):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Update the question in the questions table
-    cursor.execute('''
-    UPDATE questions
-    SET question = ?, correct_answer = ?, multiple_selection = ?
-    WHERE id = ?
-    ''', (question, correct_answer, multiple_selection, question_id))
-
-    # Delete existing choices for the question
-    cursor.execute('DELETE FROM choices WHERE question_id = ?', (question_id,))
-
-    # Insert the updated choices
-    for choice in choices:
-        cursor.execute('''
-        INSERT INTO choices (question_id, choice_text)
-        VALUES (?, ?)
-        ''', (question_id, choice))
+        question['choices'] = []
+        by_id[question['id']] = question
+
+    for question_id, choice_text in cursor.execute('SELECT question_id, choice_text FROM choices ORDER BY id'):
+        question = by_id.get(question_id)
+        if question is not None:
+            question['choices'].append(choice_text)
+
+    return questions
 
-    conn.commit()
-    conn.close()
+def fetch_questions_page(after_id=0, limit=100):
+    """
+    Fetch up to limit questions with ids greater than after_id, in id order.
+    Returns (questions, next_after_id); next_after_id is None on the last page.
+    Seeking on the primary key keeps every page equally cheap, however deep.
+    """
+    cursor = get_connection().cursor()
+
+    # One extra row tells us whether another page follows
+    rows = cursor.execute('SELECT * FROM questions WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit + 1)).fetchall()
+    questions = [dict(row) for row in rows[:limit]]
+    if not questions:
+        return questions, None
+
+    # The page covers a contiguous id range, so its choices are one index range scan
+    by_id = {}
+    for question in questions:
+        question['choices'] = []
+        by_id[question['id']] = question
+    cursor.execute('SELECT question_id, choice_text FROM choices WHERE question_id BETWEEN ? AND ? ORDER BY id',
+                   (questions[0]['id'], questions[-1]['id']))
+    for question_id, choice_text in cursor:
+        question = by_id.get(question_id)
+        if question is not None:
+            question['choices'].append(choice_text)
+
+    next_after_id = questions[-1]['id'] if len(rows) > limit else None
+    return questions, next_after_id
+
+def iter_questions(batch_size=500, after_id=0):
+    """
+    Yield every question after after_id, with its choices, one keyset page at
+    a time so only batch_size questions are held in memory.
+    """
+    while after_id is not None:
+        questions, after_id = fetch_questions_page(after_id, batch_size)
+        yield from questions
+
+def _copy_question(question):
+    # Hand out copies so callers can't modify the cached object
+    return dict(question, choices=list(question['choices']))
 
 def fetch_questions_by_ids(ids):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Use placeholders for safe querying with IN clause
-    query = f"SELECT * FROM questions WHERE id IN ({','.join('?' for _ in ids)})"
-    cursor.execute(query, ids)
-    
-    questions = cursor.fetchall()
-    conn.close()
+    """
+    Fetch the given questions with their choices, in the order of ids.
+    Questions are served from question_cache where possible; only misses hit
+    the database. Unknown ids are skipped. Each question carries its compiled
+    'answer_mask' for grading.
+    """
+    ids = list(dict.fromkeys(ids))
+
+    found = {}
+    missing = []
+    for question_id in ids:
+        question = question_cache.get((DB_PATH, question_id))
+        if question is None:
+            missing.append(question_id)
+        else:
+            found[question_id] = question
+
+    if missing:
+        cursor = get_connection().cursor()
+        loaded = []
+        for chunk in _chunks(missing, MAX_SQL_VARIABLES):
+            # Use placeholders for safe querying with IN clause
+            query = f"SELECT * FROM questions WHERE id IN ({','.join('?' for _ in chunk)})"
+            loaded.extend(dict(row) for row in cursor.execute(query, chunk))
+
+        for question in _attach_choices(cursor, loaded):
+            question['answer_mask'] = compile_answer_mask(question['correct_answer'], question['choices'])
+            question_cache.set((DB_PATH, question['id']), question)
+            found[question['id']] = question
+
+    return [_copy_question(found[question_id]) for question_id in ids if question_id in found]
+
+def question_id_snapshot():
+    """
+    Return (version, ids): every question id as a compact array plus the bank
+    version it was read at. Served from an in-process cache that is rebuilt
+    after local inserts/deletes or once the TTL expires. The array must not
+    be modified; a new one is built on every reload.
+    """
+    while True:
+        with _id_cache_lock:
+            key = (DB_PATH, _bank_version)
+            fresh = time.monotonic() - _id_cache['loaded_at'] < QUESTION_ID_CACHE_TTL
+            if _id_cache['key'] == key and fresh:
+                return _id_cache['version'], _id_cache['ids']
+
+        cursor = get_connection().cursor()
+        ids = array('q', (row[0] for row in cursor.execute('SELECT id FROM questions ORDER BY id')))
+
+        with _id_cache_lock:
+            # Only publish if no write happened while we were reading, otherwise reload
+            if key == (DB_PATH, _bank_version):
+                _id_cache.update(key=key, ids=ids, loaded_at=time.monotonic(), version=_id_cache['version'] + 1)
+                return _id_cache['version'], ids
+
+def fetch_question_ids():
+    return question_id_snapshot()[1]
+
+def invalidate_question_ids():
+    # Bumping the version also stops a reload already in flight from publishing its ids
+    global _bank_version
+    with _id_cache_lock:
+        _bank_version += 1
+        _id_cache.update(key=None, loaded_at=0.0)
+
+def cache_stats():
+    with _id_cache_lock:
+        snapshot = {
+            'version': _id_cache['version'],
+            'size': len(_id_cache['ids']),
+            'age': time.monotonic() - _id_cache['loaded_at'] if _id_cache['key'] else None,
+        }
+    return {'questions': question_cache.stats(), 'question_ids': snapshot}
+
+def fetch_random_questions(k):
+    """
+    Pick up to k distinct questions uniformly at random and load only those,
+    with their choices. Returns fewer than k when the bank is smaller.
+    """
+    ids = fetch_question_ids()
+    selected_ids = random.sample(ids, min(k, len(ids)))
+    questions = fetch_questions_by_ids(selected_ids)
+
+    if len(questions) < len(selected_ids):
+        # Some ids were deleted by another process; reload the id list and retry once
+        invalidate_question_ids()
+        ids = fetch_question_ids()
+        selected_ids = random.sample(ids, min(k, len(ids)))
+        questions = fetch_questions_by_ids(selected_ids)
+
     return questions
 
 # Fetch a question by its ID
 def fetch_question_by_id(question_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    question = cursor.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
-    choices = cursor.execute('SELECT * FROM choices WHERE question_id = ?', (question_id,)).fetchall()
-    conn.close()
-    
-    return {
-        'id': question['id'],
-        'question': question['question'],
-        'correct_answer': question['correct_answer'],
-        'multiple_selection': question['multiple_selection'],
-        'choices': [choice['choice_text'] for choice in choices]
-    }
+    questions = fetch_questions_by_ids([question_id])
+    return questions[0] if questions else None
 
 # Update a question in the database
 def update_question_in_db(question_id, question_text, correct_answer, choices, multiple_selection):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE questions SET question = ?, correct_answer = ?, multiple_selection = ? WHERE id = ?',
-                 (question_text, correct_answer, multiple_selection, question_id))
-
-    # Delete existing choices and insert updated ones
-    cursor.execute('DELETE FROM choices WHERE question_id = ?', (question_id,))
-    for choice in choices:
-        cursor.execute('INSERT INTO choices (question_id, choice_text) VALUES (?, ?)', (question_id, choice))
+    with transaction() as cursor:
+        cursor.execute('UPDATE questions SET question = ?, correct_answer = ?, multiple_selection = ? WHERE id = ?',
+                       (question_text, correct_answer, multiple_selection, question_id))
 
-    conn.commit()
-    conn.close()
+        # Delete existing choices and insert updated ones
+        cursor.execute('DELETE FROM choices WHERE question_id = ?', (question_id,))
+        cursor.executemany('INSERT INTO choices (question_id, choice_text) VALUES (?, ?)',
+                           [(question_id, choice) for choice in choices])
 
-def delete_question(question_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+        _index_questions(cursor, [(question_id, question_text, choices)])
+        _store_fingerprints(cursor, [(question_id, fingerprint(question_text, choices))])
 
-    # Delete the question from the questions table
-    cursor.execute('DELETE FROM questions WHERE id = ?', (question_id,))
+    question_cache.invalidate((DB_PATH, question_id))
 
-    # Choices will automatically be deleted due to the foreign key constraint
-    conn.commit()
-    conn.close()
-
-def fetch_quiz_history():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    # Fetch quiz history data (if you have a separate history table, modify this accordingly)
-    cursor.execute('SELECT * FROM quiz_history ORDER BY date_taken DESC')
-    history = cursor.fetchall()
-
-    conn.close()
-    return history
+def delete_question(question_id):
+    with transaction() as cursor:
+        # Delete the question from the questions table
+        cursor.execute('DELETE FROM questions WHERE id = ?', (question_id,))
+
+        # Choices are deleted by the ON DELETE CASCADE (foreign_keys is enabled per connection)
+        if _has_search_index(cursor):
+            cursor.execute('DELETE FROM question_search WHERE rowid = ?', (question_id,))
+
+    question_cache.invalidate((DB_PATH, question_id))
+    _bump_bank_version()
+
+def _fts_query(text):
+    # Quote every word so user input can't break FTS syntax; the last word matches as a prefix
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+def search_questions(text, limit=20, offset=0):
+    """
+    Full-text search over question and choice texts, best matches first.
+    Returns dicts with 'id', 'question' and 'snippet'; matched words in the
+    snippet are wrapped in SNIPPET_START / SNIPPET_END.
+    """
+    cursor = get_connection().cursor()
+
+    if not _has_search_index(cursor):
+        pattern = f"%{text.strip()}%"
+        rows = cursor.execute('''
+        SELECT id, question, question AS snippet FROM questions
+        WHERE question LIKE ? OR id IN (SELECT question_id FROM choices WHERE choice_text LIKE ?)
+        ORDER BY id LIMIT ? OFFSET ?
+        ''', (pattern, pattern, limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+
+    query = _fts_query(text)
+    if query is None:
+        return []
+
+    # Matches in the question text weigh twice as much as matches in the choices
+    rows = cursor.execute(f'''
+    SELECT rowid AS id, question,
+           snippet(question_search, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', {SEARCH_SNIPPET_TOKENS}) AS snippet
+    FROM question_search
+    WHERE question_search MATCH ?
+    ORDER BY bm25(question_search, 2.0, 1.0)
+    LIMIT ? OFFSET ?
+    ''', (query, limit, offset)).fetchall()
+    return [dict(row) for row in rows]
+
+# SQL expressions for a quiz_history row's score and rollup periods
+_PERCENTAGE_SQL = "CASE WHEN total_questions > 0 THEN correct_answers * 100.0 / total_questions ELSE 0 END"
+_ROLLUP_PERIODS = {
+    'daily': ('quiz_history_daily', "date(date_taken)"),
+    'weekly': ('quiz_history_weekly', "date(date_taken, '-6 days', 'weekday 1')"),
+}
+
+def _backfill_history_rollups(cursor):
+    # Build the rollups from history recorded before they existed
+    if cursor.execute('SELECT 1 FROM quiz_history_daily LIMIT 1').fetchone() is not None:
+        return
+    for table, period_sql in _ROLLUP_PERIODS.values():
+        cursor.execute(f'''
+        INSERT INTO {table} (period, attempts, percentage_sum, best)
+        SELECT {period_sql}, COUNT(*), SUM({_PERCENTAGE_SQL}), MAX({_PERCENTAGE_SQL})
+        FROM quiz_history GROUP BY 1
+        ''')
+
+def fetch_quiz_history(limit=50, before=None):
+    """
+    Quiz history newest first, up to limit rows. before is the (date_taken, id)
+    of the last row of the previous page; pages are read from the date index.
+    """
+    cursor = get_connection().cursor()
+    if before is None:
+        cursor.execute('SELECT * FROM quiz_history ORDER BY date_taken DESC, id DESC LIMIT ?', (limit,))
+    else:
+        cursor.execute('SELECT * FROM quiz_history WHERE (date_taken, id) < (?, ?) ORDER BY date_taken DESC, id DESC LIMIT ?',
+                       (*before, limit))
+    return cursor.fetchall()
 
 def insert_quiz_history(correct_answers, total_questions):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    with transaction() as cursor:
+        # Insert quiz history data
+        cursor.execute('''
+        INSERT INTO quiz_history (date_taken, correct_answers, total_questions)
+        VALUES (datetime('now'), ?, ?)
+        ''', (correct_answers, total_questions))
+        history_id = cursor.lastrowid
+
+        # Fold the new row into its day and week
+        for table, period_sql in _ROLLUP_PERIODS.values():
+            cursor.execute(f'''
+            INSERT INTO {table} (period, attempts, percentage_sum, best)
+            SELECT {period_sql}, 1, {_PERCENTAGE_SQL}, {_PERCENTAGE_SQL} FROM quiz_history WHERE id = ?
+            ON CONFLICT (period) DO UPDATE SET
+                attempts = attempts + 1,
+                percentage_sum = percentage_sum + excluded.percentage_sum,
+                best = MAX(best, excluded.best)
+            ''', (history_id,))
+
+def fetch_history_rollup(period='daily', since=None, window=7):
+    """
+    Report rows for each day or week, oldest first: attempts, mean and best
+    percentage, and the moving average of the mean over the last window
+    periods. since limits the rows to periods starting on or after that date.
+    """
+    table, _ = _ROLLUP_PERIODS[period]
+    cursor = get_connection().cursor()
+    # The moving average is taken over all periods before since is applied
+    rows = cursor.execute(f'''
+    SELECT * FROM (
+        SELECT period, attempts, percentage_sum / attempts AS mean, best,
+               AVG(percentage_sum / attempts) OVER (ORDER BY period ROWS BETWEEN ? PRECEDING AND CURRENT ROW) AS moving_average
+        FROM {table}
+    )
+    WHERE period >= ?
+    ORDER BY period
+    ''', (window - 1, since or '')).fetchall()
+    return [dict(row) for row in rows]
+
+def apply_question_stats(rows):
+    """
+    Add answer counts to question_stats in one transaction. rows are
+    (question_id, attempts, correct, last_seen) increments; counts for
+    questions deleted in the meantime are dropped.
+    """
+    with transaction() as cursor:
+        cursor.executemany('''
+        INSERT INTO question_stats (question_id, attempts, correct, last_seen)
+        SELECT ?1, ?2, ?3, ?4 WHERE EXISTS (SELECT 1 FROM questions WHERE id = ?1)
+        ON CONFLICT (question_id) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            correct = correct + excluded.correct,
+            last_seen = MAX(COALESCE(last_seen, 0), excluded.last_seen)
+        ''', rows)
+
+def fetch_answer_counts():
+    # question_id -> (attempts, correct, last_seen) for every answered question
+    cursor = get_connection().cursor()
+    return {row[0]: (row[1], row[2], row[3])
+            for row in cursor.execute('SELECT question_id, attempts, correct, last_seen FROM question_stats')}
+
+def fetch_question_stats(hardest=True, limit=20, min_attempts=1):
+    """
+    Questions ranked by the share of correct answers, lowest first when
+    hardest is set, ignoring questions answered fewer than min_attempts times.
+    """
+    cursor = get_connection().cursor()
+    direction = 'ASC' if hardest else 'DESC'
+    rows = cursor.execute(f'''
+    SELECT s.question_id AS id, q.question, s.attempts, s.correct,
+           (s.correct * 1.0) / s.attempts AS accuracy, s.last_seen
+    FROM question_stats s JOIN questions q ON q.id = s.question_id
+    WHERE s.attempts >= ?
+    ORDER BY (s.correct * 1.0) / s.attempts {direction}, s.attempts DESC
+    LIMIT ?
+    ''', (min_attempts, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def apply_review_results(question_ids, reschedule, reviewed_at, initial_ease):
+    """
+    Reschedule the given questions in one transaction. reschedule is called
+    with (question_id, repetitions, interval_days, ease) - the stored state, or
+    a fresh one for questions never reviewed - and returns the new
+    (repetitions, interval_days, ease, due_at). Deleted questions are skipped.
+    """
+    question_ids = list(question_ids)
+    with transaction() as cursor:
+        state = {}
+        for chunk in _chunks(question_ids, MAX_SQL_VARIABLES):
+            placeholders = ','.join('?' for _ in chunk)
+            for row in cursor.execute(f'SELECT question_id, repetitions, interval_days, ease FROM review_schedule '
+                                      f'WHERE question_id IN ({placeholders})', chunk):
+                state[row[0]] = (row[1], row[2], row[3])
+
+        rows = []
+        for question_id in question_ids:
+            repetitions, interval_days, ease = state.get(question_id, (0, 0.0, initial_ease))
+            rows.append((question_id, *reschedule(question_id, repetitions, interval_days, ease), reviewed_at))
+        cursor.executemany('''
+        INSERT OR REPLACE INTO review_schedule (question_id, repetitions, interval_days, ease, due_at, last_reviewed)
+        SELECT ?1, ?2, ?3, ?4, ?5, ?6 WHERE EXISTS (SELECT 1 FROM questions WHERE id = ?1)
+        ''', rows)
+
+def fetch_due_question_ids(now, limit):
+    # Walks idx_review_schedule_due_at from the oldest due time and stops after limit rows
+    cursor = get_connection().cursor()
+    rows = cursor.execute('SELECT question_id FROM review_schedule WHERE due_at <= ? ORDER BY due_at LIMIT ?', (now, limit))
+    return [row[0] for row in rows]
+
+def count_due_reviews(now):
+    cursor = get_connection().cursor()
+    return cursor.execute('SELECT COUNT(*) FROM review_schedule WHERE due_at <= ?', (now,)).fetchone()[0]
+
+def insert_ocr_job(job_id, timeout, pages=1):
+    with transaction() as cursor:
+        cursor.execute("INSERT INTO ocr_jobs (id, status, created_at, timeout, pages) VALUES (?, 'pending', ?, ?, ?)",
+                       (job_id, time.time(), timeout, pages))
+
+def finish_ocr_job(job_id, status, result=None, error=None):
+    """
+    Record the outcome of a pending job. result is stored as JSON text.
+    Jobs that already finished (e.g. marked as timed out) are left alone.
+    """
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE ocr_jobs SET status = ?, finished_at = ?, result = ?, error = ?
+        WHERE id = ? AND status = 'pending'
+        ''', (status, time.time(), json.dumps(result) if result is not None else None, error, job_id))
+
+def fetch_ocr_job(job_id):
+    cursor = get_connection().cursor()
+    row = cursor.execute('SELECT * FROM ocr_jobs WHERE id = ?', (job_id,)).fetchone()
+    if row is None:
+        return None
+
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+def delete_expired_ocr_jobs(max_age):
+    with transaction() as cursor:
+        cursor.execute('DELETE FROM ocr_jobs WHERE created_at < ?', (time.time() - max_age,))
+
+def insert_quiz_session(token, question_ids, answer_masks, choice_counts, questions, started_at, expires_at):
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT INTO quiz_sessions (token, question_ids, answer_masks, choice_counts, questions, started_at, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (token, question_ids, answer_masks, choice_counts, questions, started_at, expires_at))
+
+def fetch_quiz_session(token, now):
+    # Expired sessions are never returned, even before they are cleaned up
+    cursor = get_connection().cursor()
+    row = cursor.execute('SELECT * FROM quiz_sessions WHERE token = ? AND expires_at > ?', (token, now)).fetchone()
+    return dict(row) if row is not None else None
+
+def delete_quiz_session(token):
+    """Delete a session; returns False if it was already gone, so a quiz can only be submitted once."""
+    with transaction() as cursor:
+        return cursor.execute('DELETE FROM quiz_sessions WHERE token = ?', (token,)).rowcount > 0
+
+def delete_expired_quiz_sessions(now):
+    with transaction() as cursor:
+        cursor.execute('DELETE FROM quiz_sessions WHERE expires_at <= ?', (now,))
+
+def fetch_ocr_cache(key):
+    """
+    Return the cached question list for key, or None. A hit refreshes the
+    entry's last-used time and hit count.
+    """
+    with transaction() as cursor:
+        row = cursor.execute('SELECT result FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        cursor.execute('UPDATE ocr_cache SET hits = hits + 1, last_used_at = ? WHERE key = ?', (time.time(), key))
+
+    return json.loads(row['result'])
+
+def store_ocr_cache(key, result, upload_size, max_bytes):
+    """
+    Cache a question list, then evict least recently used entries until the
+    stored results fit in max_bytes.
+    """
+    result = json.dumps(result)
+    now = time.time()
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT OR REPLACE INTO ocr_cache (key, result, result_size, upload_size, hits, created_at, last_used_at)
+        VALUES (?, ?, ?, ?, 0, ?, ?)
+        ''', (key, result, len(result), upload_size, now, now))
 
-    # Insert quiz history data (add your table if necessary)
-    cursor.execute('''
-    INSERT INTO quiz_history (date_taken, correct_answers, total_questions)
-    VALUES (datetime('now'), ?, ?)
-    ''', (correct_answers, total_questions))
+        cursor.execute('''
+        DELETE FROM ocr_cache WHERE key IN (
+            SELECT key FROM (
+                SELECT key, SUM(result_size) OVER (ORDER BY last_used_at DESC, key) AS total
+                FROM ocr_cache
+            ) WHERE total > ?
+        )
+        ''', (max_bytes,))
+        return cursor.rowcount
+
+def fetch_ocr_cache_totals():
+    cursor = get_connection().cursor()
+    row = cursor.execute('''
+    SELECT COUNT(*) AS entries,
+           COALESCE(SUM(result_size), 0) AS stored_bytes,
+           COALESCE(SUM(hits), 0) AS hits,
+           COALESCE(SUM(hits * upload_size), 0) AS bytes_saved
+    FROM ocr_cache
+    ''').fetchone()
+    return dict(row)
+
+def fetch_http_cache(url):
+    cursor = get_connection().cursor()
+    row = cursor.execute('SELECT * FROM http_cache WHERE url = ?', (url,)).fetchone()
+    return dict(row) if row is not None else None
+
+def store_http_cache(url, etag, last_modified, body, max_entries):
+    """Cache a fetched page, keeping only the max_entries most recently fetched."""
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, fetched_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (url, etag, last_modified, body, time.time()))
 
-    conn.commit()
-    conn.close()
\ No newline at end of file
+        cursor.execute('''
+        DELETE FROM http_cache WHERE url IN (
+            SELECT url FROM http_cache ORDER BY fetched_at DESC LIMIT -1 OFFSET ?
+        )
+        ''', (max_entries,))
+
+def touch_http_cache(url):
+    # A 304 response means the cached copy is current again
+    with transaction() as cursor:
+        cursor.execute('UPDATE http_cache SET fetched_at = ? WHERE url = ?', (time.time(), url))
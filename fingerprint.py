@@ -0,0 +1,97 @@
+import hashlib
+import re
+import unicodedata
+import zlib
+from array import array
+
+# Near-duplicate fingerprints for questions. A question (with its choices) is
+# normalized so whitespace, case, punctuation, accents and choice labels don't
+# matter. The hash of that text catches exact repeats. A MinHash signature
+# over its character shingles catches repeats with a little OCR noise.
+SHINGLE_SIZE = 4               # characters per shingle
+MINHASH_BINS = 32              # signature length, a power of two (one-permutation MinHash)
+MINHASH_BANDS = 8              # LSH bands of MINHASH_BINS // MINHASH_BANDS values each
+NEAR_DUPLICATE_SIMILARITY = 0.75  # estimated Jaccard similarity that counts as a duplicate
+
+_ROWS_PER_BAND = MINHASH_BINS // MINHASH_BANDS
+_BIN_BITS = (MINHASH_BINS - 1).bit_length()
+_VALUE_BITS = 48
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+
+# Choice labels ("A.", "b)") and anything that is not a letter or digit
+CHOICE_LABEL_RE = re.compile(r'^\s*[A-Za-z][.)]\s*')
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+def normalize_text(text):
+    # Case, accents, punctuation and runs of whitespace are all OCR/formatting noise
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return NON_WORD_RE.sub(' ', text.casefold()).strip()
+
+def normalize_question(question, choices):
+    """
+    Canonical text of a question and its choices. Choices are sorted so the
+    same question with shuffled options normalizes the same way.
+    """
+    normalized_choices = sorted(normalize_text(CHOICE_LABEL_RE.sub('', choice)) for choice in choices)
+    return '\n'.join([normalize_text(question)] + normalized_choices)
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+def _shingle_hash(shingle):
+    # CRC32 spread over 64 bits with a multiplicative (Fibonacci) hash; much
+    # cheaper than a cryptographic hash for the hundreds of shingles per question
+    return (zlib.crc32(shingle.encode('utf-8')) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+
+def minhash(text):
+    """
+    One-permutation MinHash of the text's character shingles: each shingle is
+    hashed once, the hash picks a bin and every bin keeps its smallest value.
+    Empty bins borrow from the next filled bin so short texts still compare.
+    Returns an array of MINHASH_BINS unsigned 64-bit values.
+    """
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+    bins = [None] * MINHASH_BINS
+    for shingle in shingles:
+        value = _shingle_hash(shingle)
+        index = value >> (64 - _BIN_BITS)
+        value = (value >> 8) & _VALUE_MASK
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    # Densify: an empty bin takes the next filled bin's value, tagged with the
+    # distance so borrowed values only match values borrowed the same way
+    signature = array('Q', [0] * MINHASH_BINS)
+    for index in range(MINHASH_BINS):
+        for distance in range(MINHASH_BINS):
+            value = bins[(index + distance) % MINHASH_BINS]
+            if value is not None:
+                signature[index] = value | (distance << _VALUE_BITS)
+                break
+    return signature
+
+def similarity(signature_a, signature_b):
+    # Fraction of equal bins estimates the Jaccard similarity of the shingle sets
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / MINHASH_BINS
+
+def band_keys(signature):
+    """
+    LSH keys for a signature: questions sharing any key are near-duplicate
+    candidates. Keys are signed 64-bit so SQLite can index them.
+    """
+    keys = []
+    for band in range(MINHASH_BANDS):
+        rows = signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]
+        key = _hash64(bytes([band]) + rows.tobytes())
+        keys.append(key - (1 << 64) if key >> 63 else key)
+    return keys
+
+def fingerprint(question, choices):
+    """Return (text_hash, signature) for a question and its choices."""
+    text = normalize_question(question, choices)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest(), minhash(text)
@@ -0,0 +1,111 @@
+import re
+
+# Quiz grading. A question's stored correct answer is compiled once into a
+# bitmask over its choice indexes (bit i set means choice i is correct), so
+# grading a submission is a few integer operations per question and the
+# order of multi-select answers doesn't matter.
+ANSWER_SEPARATOR = ', '
+
+# Bit for each submitted choice index value
+_INDEX_BITS = {str(index): 1 << index for index in range(64)}
+
+# Answers given as choice letters: "A", "A, C", "AC"
+LETTER_ANSWER_RE = re.compile(r'[A-Za-z](?:[ \t]*,?[ \t]*[A-Za-z])*')
+
+def choice_text_mask(answer, choices):
+    # Parse answer as choice texts joined by ANSWER_SEPARATOR, or 0 if it isn't;
+    # choice texts may themselves contain commas, so try every choice at each position
+    texts = [choice.strip() for choice in choices]
+
+    def parse(position):
+        for index, text in enumerate(texts):
+            if not text or not answer.startswith(text, position):
+                continue
+            end = position + len(text)
+            if end == len(answer):
+                return 1 << index
+            if answer.startswith(ANSWER_SEPARATOR, end):
+                rest = parse(end + len(ANSWER_SEPARATOR))
+                if rest:
+                    return rest | 1 << index
+        return 0
+
+    return parse(0)
+
+def compile_answer_mask(correct_answer, choices):
+    """
+    Resolve a stored correct answer to a bitmask of choice indexes. The answer
+    can be one choice's text, several choice texts joined with ', ', or choice
+    letters ("A, C"). Returns 0 when it can't be resolved against the choices.
+    """
+    answer = (correct_answer or '').strip()
+    if not answer:
+        return 0
+
+    mask = choice_text_mask(answer, choices)
+    if mask:
+        return mask
+
+    if LETTER_ANSWER_RE.fullmatch(answer):
+        for letter in re.findall(r'[A-Za-z]', answer.upper()):
+            index = ord(letter) - ord('A')
+            if index >= len(choices):
+                return 0
+            mask |= 1 << index
+    return mask
+
+def submitted_mask(values, choice_count):
+    # The quiz form submits choice indexes; anything else is ignored
+    mask = 0
+    for value in values or ():
+        mask |= _INDEX_BITS.get(value, 0)
+    return mask & ((1 << choice_count) - 1)
+
+def mask_choices(mask, choices):
+    return [choice for index, choice in enumerate(choices) if mask >> index & 1]
+
+def score_answer(selected, correct, partial_credit=False):
+    """
+    Score one answer between 0 and 1. Without partial credit only an exact
+    match counts; with it, each correct pick earns a share of the point and
+    each wrong pick takes one away.
+    """
+    if selected == correct:
+        return 1.0
+    if not partial_credit or not correct:
+        return 0.0
+    hits = (selected & correct).bit_count()
+    misses = (selected & ~correct).bit_count()
+    return max(0.0, (hits - misses) / correct.bit_count())
+
+def grade_submission(questions, answers, partial_credit=False):
+    """
+    Grade a whole submission in one pass. questions are question dicts (with
+    'answer_mask' when loaded through the question cache); answers maps form
+    field names 'answer_<id>' to lists of submitted values.
+    Returns (results, total) where results maps each question id to
+    (selected_mask, score).
+    """
+    results = {}
+    total = 0.0
+    for question in questions:
+        choices = question['choices']
+        correct = question.get('answer_mask')
+        if correct is None:
+            correct = compile_answer_mask(question['correct_answer'], choices)
+
+        selected = submitted_mask(answers.get(f"answer_{question['id']}"), len(choices))
+        if correct:
+            score = 1.0 if selected == correct else score_answer(selected, correct, partial_credit)
+        else:
+            # Answers that name no choice are still compared as text
+            score = 1.0 if selected and ANSWER_SEPARATOR.join(mask_choices(selected, choices)) == question['correct_answer'] else 0.0
+
+        results[question['id']] = (selected, score)
+        total += score
+    return results, total
+
+def score_status(score):
+    if score == 1.0:
+        return 'correct'
+    return 'partial' if score > 0 else 'wrong'
@@ -0,0 +1,20 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+# Splitting multi-page uploads for batch OCR jobs. This runs in the web
+# process, so it is kept apart from the OCR pipeline and only imported once
+# a batch is submitted.
+
+def count_frames(data):
+    # Multi-page TIFFs (and animated images) have several frames, everything else one.
+    # PIL only reads the headers here.
+    with Image.open(io.BytesIO(data)) as image:
+        return getattr(image, 'n_frames', 1)
+
+def iter_frames(data):
+    """Yield each frame of a multi-page image as a grayscale NumPy array."""
+    with Image.open(io.BytesIO(data)) as image:
+        for frame in ImageSequence.Iterator(image):
+            yield np.asarray(frame.convert('L'))
@@ -0,0 +1,227 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Request and pipeline instrumentation: latency histograms per route, timers
+# per stage (db, decode, preprocess, tesseract, parse, render, fetch), SQL
+# statement counts per request, and an opt-in sampling profiler.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 1000))    # requests logged with their stage breakdown
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.005))  # seconds between profiler samples
+
+# Upper bounds of the histogram buckets; anything above the last goes in +Inf
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram with count, sum and estimated percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def _percentile(self, counts, fraction):
+        # Upper bound of the bucket holding the given fraction of observations
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            result = {'count': self.count, 'sum': round(self.total, 3), 'max': round(self.max, 3),
+                      'mean': round(self.total / self.count, 3) if self.count else 0.0}
+        result['p50'] = self._percentile(counts, 0.50)
+        result['p95'] = self._percentile(counts, 0.95)
+        result['p99'] = self._percentile(counts, 0.99)
+        result['buckets'] = {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), counts)}
+        return result
+
+_registry_lock = threading.Lock()
+_route_latency = {}
+_route_queries = {}
+_stage_timers = {}
+
+def _histogram(registry, name, buckets=LATENCY_BUCKETS_MS):
+    histogram = registry.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = registry.setdefault(name, Histogram(buckets))
+    return histogram
+
+# Per-request accumulator: {'stages': {name: ms}, 'queries': n}. A mutable dict
+# in a context variable, so work done for the request on other threads counts
+# too, as long as it runs in a copy of the request's context: url_ingest
+# submits its fetches that way, and aio.offload/run_coroutine carry it over.
+_current_request = contextvars.ContextVar('metrics_request', default=None)
+
+# Set in OCR worker processes: stage timings are sent to the web process
+_worker_queue = None
+
+def start_request():
+    state = {'stages': Counter(), 'queries': 0, 'started': time.perf_counter()}
+    _current_request.set(state)
+    return state
+
+def finish_request(state, route):
+    """Record a finished request; returns its latency in milliseconds."""
+    elapsed = (time.perf_counter() - state['started']) * 1000
+    _histogram(_route_latency, route).observe(elapsed)
+    _histogram(_route_queries, route, QUERY_COUNT_BUCKETS).observe(state['queries'])
+    if state['queries']:
+        # SQL time is observed once per request rather than once per statement
+        _histogram(_stage_timers, 'db').observe(state['stages']['db'])
+    _current_request.set(None)
+    return elapsed
+
+def record_stage(name, elapsed_ms):
+    if _worker_queue is not None:
+        _worker_queue.put((name, elapsed_ms))
+        return
+    _histogram(_stage_timers, name).observe(elapsed_ms)
+    state = _current_request.get()
+    if state is not None:
+        state['stages'][name] += elapsed_ms
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as one run of the named stage."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, (time.perf_counter() - started) * 1000)
+
+def record_query(started):
+    # Called by the instrumented SQLite cursor after every statement; statements
+    # run outside a request (background flushes, warm-up) aren't counted
+    state = _current_request.get()
+    if state is not None:
+        state['queries'] += 1
+        state['stages']['db'] += (time.perf_counter() - started) * 1000
+
+def init_worker(queue):
+    # ProcessPoolExecutor initializer for OCR workers
+    global _worker_queue
+    _worker_queue = queue
+
+def start_worker_collector(queue):
+    """Fold stage timings sent by worker processes into this process's timers."""
+    def collect():
+        while True:
+            name, elapsed_ms = queue.get()
+            _histogram(_stage_timers, name).observe(elapsed_ms)
+
+    threading.Thread(target=collect, daemon=True, name='metrics-collector').start()
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread samples every thread's stack
+    each interval and counts the functions it finds. Costs nothing while
+    stopped and little while running, since the profiled code isn't traced.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.samples = 0
+            self.leaf = Counter()
+            self.inclusive = Counter()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='sampling-profiler')
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    self.samples += 1
+                    self.leaf[self._label(frame)] += 1
+                    seen = set()
+                    while frame is not None:
+                        seen.add(self._label(frame))
+                        frame = frame.f_back
+                    self.inclusive.update(seen)
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}:{code.co_name}"
+
+    def report(self, limit=25):
+        with self._lock:
+            samples = self.samples or 1
+            return {
+                'running': self.running,
+                'interval': self.interval,
+                'samples': self.samples,
+                'self': [{'function': name, 'samples': count, 'share': round(count / samples, 4)}
+                         for name, count in self.leaf.most_common(limit)],
+                'inclusive': [{'function': name, 'samples': count, 'share': round(count / samples, 4)}
+                              for name, count in self.inclusive.most_common(limit)],
+            }
+
+profiler = SamplingProfiler()
+
+def snapshot():
+    with _registry_lock:
+        routes = sorted(set(_route_latency) | set(_route_queries))
+        stages = sorted(_stage_timers)
+    return {
+        'enabled': METRICS_ENABLED,
+        'routes': {route: {'latency_ms': _route_latency[route].snapshot(), 'queries': _route_queries[route].snapshot()}
+                   for route in routes},
+        'stages_ms': {name: _stage_timers[name].snapshot() for name in stages},
+        'profiler': {'running': profiler.running, 'samples': profiler.samples},
+    }
@@ -0,0 +1,97 @@
+import logging
+import re
+
+import cv2
+import numpy as np
+import pytesseract
+
+from metrics import stage
+from ocr_pool import TESSERACT_CONFIG
+from question_parser import extract_questions_and_choices
+
+# The OCR pipeline itself. Only OCR worker processes (and benchmarks) import
+# this module; the web process goes through ocr_pool and never loads OpenCV
+# or Tesseract.
+
+# Kernel used to sharpen the denoised image
+SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+
+def decode_image(data):
+    """
+    Decode uploaded image bytes straight into a grayscale NumPy array,
+    without a temporary file or an intermediate RGB copy.
+    """
+    with stage('decode'):
+        gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("Unsupported or corrupt image")
+    return gray
+
+# Preprocess the image for better OCR performance
+def preprocess_image(gray):
+    """Binarize, denoise and sharpen a grayscale array; returns a new array."""
+    logging.debug("Preprocessing the image for better OCR.")
+
+    with stage('preprocess'):
+        # Apply thresholding to get a binary image (binarization)
+        _, binary_image = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # Denoising to remove potential noise and artifacts
+        denoised_image = cv2.fastNlMeansDenoising(binary_image, None, 30, 7, 21)
+
+        # Sharpen the image using a kernel
+        return cv2.filter2D(denoised_image, -1, SHARPEN_KERNEL)
+
+def extract_text(image, timeout=0):
+    logging.debug("Running Tesseract OCR on the preprocessed image.")
+    # A non-zero timeout makes pytesseract kill the tesseract process when it runs over
+    with stage('tesseract'):
+        extracted_text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG, timeout=timeout)
+    return extracted_text
+
+def correct_spacing(extracted_text):
+    logging.debug("Correcting spacing issues in the extracted text.")
+    
+    # Insert space after periods (A., B., C., etc.)
+    corrected_text = re.sub(r'([A-Z])\.', r'\1. ', extracted_text)
+
+    # Handle cases where OCR output is squashed together
+    corrected_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', corrected_text)
+    corrected_text = re.sub(r'([A-Z][a-z])([A-Z][a-z])', r'\1 \2', corrected_text)
+
+    # Ensure spaces around symbols like colon or parenthesis
+    corrected_text = re.sub(r'([a-zA-Z0-9])([:,()])', r'\1 \2', corrected_text)
+    corrected_text = re.sub(r'([:,()])([a-zA-Z0-9])', r'\1 \2', corrected_text)
+
+    return corrected_text
+
+def image_to_text(image, timeout=0):
+    """
+    OCR one page: preprocess, Tesseract and spacing correction. image is
+    either the encoded upload bytes or an already decoded grayscale array.
+    Runs inside an OCR worker process.
+    """
+    gray = decode_image(image) if isinstance(image, bytes) else image
+    preprocessed_image = preprocess_image(gray)
+
+    # Tesseract takes the NumPy array as is
+    extracted_text = extract_text(preprocessed_image, timeout=timeout)
+
+    # Lazy %s formatting: the page text is only copied into a message when debug logging is on
+    logging.debug("Extracted Text Before Correction:\n%s", extracted_text)
+
+    # Correct missing spaces
+    corrected_text = correct_spacing(extracted_text)
+
+    logging.debug("Corrected Text:\n%s", corrected_text)
+    return corrected_text
+
+def image_to_questions(image, timeout=0):
+    """
+    Full OCR pipeline for one screenshot, from image to parsed questions.
+    Runs inside an OCR worker process.
+    """
+    # Process the corrected text to extract questions and choices
+    text = image_to_text(image, timeout=timeout)
+    with stage('parse'):
+        return extract_questions_and_choices(text)
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from database import (insert_ocr_job, finish_ocr_job, fetch_ocr_job, delete_expired_ocr_jobs,
+                      fetch_ocr_cache, store_ocr_cache, fetch_ocr_cache_totals)
+from ocr_pool import ocr_pool, run_ocr_task, OCRBusyError, OCR_PIPELINE_VERSION, TESSERACT_CONFIG
+from question_parser import QuestionExtractor
+
+# Finished or abandoned jobs are forgotten after this many seconds
+OCR_JOB_TTL = float(os.environ.get('OCR_JOB_TTL', 3600))
+
+# Batch uploads processed at the same time; each one feeds pages to the shared OCR pool
+OCR_MAX_BATCHES = int(os.environ.get('OCR_MAX_BATCHES', 2))
+_batch_slots = threading.BoundedSemaphore(OCR_MAX_BATCHES)
+
+# Total size of cached OCR results (JSON) before least recently used entries are evicted
+OCR_CACHE_MAX_BYTES = int(os.environ.get('OCR_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+# Completion futures of the jobs still running in this process, so the ASGI
+# serving mode can await a job instead of polling its row
+_running = {}
+
+# Counters for this process; fetch_ocr_cache_totals() has the totals across all processes
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'evictions': 0}
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+def ocr_cache_key(data):
+    """
+    Hash the uploaded bytes together with the OCR settings, so identical
+    screenshots processed the same way share one cached result.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{OCR_PIPELINE_VERSION}\0{TESSERACT_CONFIG}\0".encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+def submit_ocr_job(data):
+    """
+    Queue an uploaded screenshot (its encoded bytes) for OCR and return the
+    new job id straight away. Screenshots seen before are answered from the
+    OCR cache and their job is already done on return. Raises
+    ocr_pool.OCRBusyError when the in-flight limit is reached.
+    """
+    delete_expired_ocr_jobs(OCR_JOB_TTL)
+
+    job_id = uuid.uuid4().hex
+    insert_ocr_job(job_id, ocr_pool.job_timeout)
+
+    upload_size = len(data)
+    cache_key = ocr_cache_key(data)
+    cached = fetch_ocr_cache(cache_key)
+    if cached is not None:
+        _count(hits=1, bytes_saved=upload_size)
+        finish_ocr_job(job_id, 'done', result=cached)
+        logging.debug("OCR job %s answered from cache", job_id)
+        return job_id
+
+    _count(misses=1)
+    try:
+        future = ocr_pool.submit(run_ocr_task, 'image_to_questions', data, ocr_pool.job_timeout)
+    except Exception as e:
+        finish_ocr_job(job_id, 'failed', error=str(e))
+        raise
+
+    def on_done(future):
+        try:
+            questions = future.result()
+            finish_ocr_job(job_id, 'done', result=questions)
+            evicted = store_ocr_cache(cache_key, questions, upload_size, OCR_CACHE_MAX_BYTES)
+            _count(evictions=evicted)
+            logging.debug("OCR job %s finished with %d questions", job_id, len(questions))
+        except Exception as e:
+            logging.error(f"OCR job {job_id} failed: {str(e)}")
+            finish_ocr_job(job_id, 'failed', error=str(e))
+        finally:
+            _running.pop(job_id, None)
+
+    # Callbacks run in order, so anyone awaiting the job sees its row already finished
+    _running[job_id] = future
+    future.add_done_callback(on_done)
+    return job_id
+
+def submit_ocr_batch_job(uploads):
+    """
+    Queue several uploaded images (their encoded bytes; any of them may be a
+    multi-page TIFF) as one job and return its id straight away. Pages are
+    OCR'd in parallel and their text is parsed in page order, so questions
+    spanning a page break are stitched together. Raises ocr_pool.OCRBusyError
+    when too many batches are already running.
+    """
+    if not _batch_slots.acquire(blocking=False):
+        raise OCRBusyError("Too many batch uploads are being processed")
+
+    try:
+        # PIL and NumPy are only loaded once someone uploads a batch
+        from image_frames import count_frames
+        delete_expired_ocr_jobs(OCR_JOB_TTL)
+        frame_counts = [count_frames(data) for data in uploads]
+    except Exception:
+        _batch_slots.release()
+        raise
+
+    # Allow one job timeout per round of pages across the workers, plus one for queueing
+    num_pages = sum(frame_counts)
+    rounds = -(-num_pages // ocr_pool.max_workers)
+    job_id = uuid.uuid4().hex
+    insert_ocr_job(job_id, ocr_pool.job_timeout * (rounds + 1), pages=num_pages)
+
+    _running[job_id] = Future()
+    threading.Thread(target=_run_batch, args=(job_id, uploads, frame_counts), daemon=True).start()
+    return job_id
+
+def _iter_pages(uploads, frame_counts):
+    # Single images go to the workers still encoded; multi-page files are split
+    # into grayscale frames here so each worker only receives its own page
+    for data, frames in zip(uploads, frame_counts):
+        if frames == 1:
+            yield data
+        else:
+            from image_frames import iter_frames
+            yield from iter_frames(data)
+
+def _run_batch(job_id, uploads, frame_counts):
+    start = time.perf_counter()
+    num_pages = sum(frame_counts)
+    try:
+        # A batch keeps at most one page per worker in flight, so single uploads
+        # still find free queue slots while a large batch is running
+        in_flight = threading.BoundedSemaphore(ocr_pool.max_workers)
+        futures = []
+        for page in _iter_pages(uploads, frame_counts):
+            in_flight.acquire()
+            try:
+                future = ocr_pool.submit(run_ocr_task, 'image_to_text', page, ocr_pool.job_timeout, block=True)
+            except Exception:
+                in_flight.release()
+                raise
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+
+        extractor = QuestionExtractor()
+        questions = []
+        failed_pages = []
+        for page_number, future in enumerate(futures, start=1):
+            try:
+                text = future.result()
+            except Exception as e:
+                logging.error(f"OCR batch {job_id}: page {page_number} failed: {str(e)}")
+                failed_pages.append(page_number)
+                continue
+            questions.extend(extractor.feed(text))
+        questions.extend(extractor.finish())
+
+        elapsed = time.perf_counter() - start
+        logging.info(f"OCR batch {job_id}: {num_pages} pages in {elapsed:.1f}s ({num_pages / elapsed:.2f} pages/sec)")
+
+        if failed_pages and len(failed_pages) == num_pages:
+            finish_ocr_job(job_id, 'failed', error="No page could be processed")
+        else:
+            error = f"Pages that could not be processed: {', '.join(map(str, failed_pages))}" if failed_pages else None
+            finish_ocr_job(job_id, 'done', result=questions, error=error)
+    except Exception as e:
+        logging.error(f"OCR batch {job_id} failed: {str(e)}")
+        finish_ocr_job(job_id, 'failed', error=str(e))
+    finally:
+        _batch_slots.release()
+        _running.pop(job_id).set_result(None)
+
+def running_ocr_job(job_id):
+    """The concurrent.futures.Future that completes when the job finishes, or None if it isn't running here."""
+    return _running.get(job_id)
+
+def get_ocr_job(job_id):
+    """
+    Return the job record (status, timestamps, result, error) or None if it
+    is unknown or expired. Pending jobs past the timeout are marked failed.
+    """
+    job = fetch_ocr_job(job_id)
+    if job is None or time.time() - job['created_at'] > OCR_JOB_TTL:
+        return None
+
+    if job['status'] == 'pending' and time.time() - job['created_at'] > job['timeout']:
+        finish_ocr_job(job_id, 'failed', error="Processing the screenshot took too long")
+        job = fetch_ocr_job(job_id)
+
+    return job
+
+def ocr_cache_stats():
+    with _stats_lock:
+        process = dict(_stats)
+    lookups = process['hits'] + process['misses']
+    process['hit_rate'] = process['hits'] / lookups if lookups else 0.0
+    return {'process': process, 'totals': fetch_ocr_cache_totals(), 'max_bytes': OCR_CACHE_MAX_BYTES}
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import init_worker, start_worker_collector, METRICS_ENABLED
+
+# OCR worker pool sizing; the pool is created lazily on the first job
+OCR_MAX_WORKERS = int(os.environ.get('OCR_MAX_WORKERS', os.cpu_count() or 2))
+OCR_QUEUE_DEPTH = int(os.environ.get('OCR_QUEUE_DEPTH', OCR_MAX_WORKERS * 2))  # jobs allowed to wait for a worker
+OCR_JOB_TIMEOUT = float(os.environ.get('OCR_JOB_TIMEOUT', 60))                 # seconds per job
+
+# Bump when preprocessing or parsing changes so cached OCR results are not reused
+OCR_PIPELINE_VERSION = "2"
+
+TESSERACT_CONFIG = "--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,:()[]"
+
+def run_ocr_task(name, *args):
+    # Runs in a worker: the OCR stack (OpenCV, Tesseract) is imported there,
+    # so submitting a job never loads it into the web process
+    import ocr
+    return getattr(ocr, name)(*args)
+
+class OCRBusyError(Exception):
+    """Raised when the OCR queue is full and a job is rejected."""
+
+class OCRPool:
+    """
+    Bounded process pool for OCR jobs. At most max_workers jobs run at once
+    and queue_depth more may wait; anything beyond that is rejected with
+    OCRBusyError so the web workers are never tied up behind a long queue.
+    """
+
+    def __init__(self, max_workers=OCR_MAX_WORKERS, queue_depth=OCR_QUEUE_DEPTH, job_timeout=OCR_JOB_TIMEOUT):
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.job_timeout = job_timeout
+        self._slots = threading.BoundedSemaphore(max_workers + queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._metrics_queue = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn keeps the web process's threads and SQLite handles out of the workers
+                context = multiprocessing.get_context('spawn')
+                options = {}
+                if METRICS_ENABLED:
+                    # Workers send their stage timings back over a queue
+                    if self._metrics_queue is None:
+                        self._metrics_queue = context.Queue()
+                        start_worker_collector(self._metrics_queue)
+                    options = {'initializer': init_worker, 'initargs': (self._metrics_queue,)}
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    **options,
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        # A worker died (e.g. out of memory); drop the pool so the next job starts a fresh one
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, func, *args, block=False):
+        """
+        Queue func(*args) on a worker and return its future.
+        Raises OCRBusyError when the queue is full, unless block is set, in
+        which case it waits for a free slot (used to feed batch jobs).
+        """
+        if not self._slots.acquire(blocking=block):
+            raise OCRBusyError("OCR queue is full")
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset_executor()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        """
+        Run func(*args) on a worker and wait for the result, up to job_timeout.
+        Raises OCRBusyError when saturated and concurrent.futures.TimeoutError
+        when the job runs too long.
+        """
+        future = self.submit(func, *args)
+        try:
+            return future.result(timeout=self.job_timeout)
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+        finally:
+            future.cancel()  # no-op if running; drops the job if it is still queued
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+ocr_pool = OCRPool()
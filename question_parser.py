@@ -0,0 +1,237 @@
+import logging
+import re
+
+from grading import choice_text_mask, mask_choices
+
+# The question grammar shared by the OCR extractor and the text dump parser.
+# Whitespace inside a pattern is limited to spaces and tabs so no pattern
+# can run across a line break.
+HEADER_PATTERN = r'Question[ \t]?\d+[ \t]?\( Single Topic \)'
+SKIP_PATTERN = r'Reference|Next Question'
+# OCR may lower-case a choice letter, so the extractor accepts either case.
+# Typed dumps label choices in capitals only, which keeps lines such as
+# "a." or "e.g. ..." in the question text.
+CHOICE_PATTERN = r'(?P<label>[A-Za-z])\.[ \t]?(?P<choice>[^\n]*)'
+TEXT_CHOICE_PATTERN = r'(?P<label>[A-Z])\.[ \t]?(?P<choice>[^\n]*)'
+ANSWER_PATTERN = r'Answer[ \t]?:[ \t]?(?P<answer>[^\n]*)'
+
+# Finds question headers anywhere, including several on one line
+HEADER_RE = re.compile(HEADER_PATTERN)
+
+# Classifies one stripped line with a single match; alternatives are tried in
+# priority order: skip, header, choice, answer. No match means question text.
+LINE_RE = re.compile(rf'(?P<skip>{SKIP_PATTERN})|(?P<header>{HEADER_PATTERN})|{CHOICE_PATTERN}|{ANSWER_PATTERN}')
+
+# Finds the skip, choice and answer lines of a whole question block in one scan
+BLOCK_LINE_RE = re.compile(rf'^[ \t]*(?:(?P<skip>{SKIP_PATTERN})|{TEXT_CHOICE_PATTERN}|{ANSWER_PATTERN})', re.M)
+
+# A whole answer made of choice letters: "B", "CD", "A, C"
+ANSWER_LETTERS_RE = re.compile(r'[A-Z](?:[ ,]*[A-Z])*')
+LETTER_RE = re.compile(r'[A-Z]')
+
+# Longest tail kept between chunks while no header has been seen, so a header
+# split across two chunks is still found
+_HEADER_CARRY = 64
+
+# Size of the pieces an uploaded dump is read in
+TEXT_CHUNK_SIZE = 64 * 1024
+
+# Token kinds produced by tokenize()
+HEADER = 'header'
+CHOICE = 'choice'
+ANSWER = 'answer'
+TEXT = 'text'
+
+def tokenize(lines):
+    """
+    Classify an iterable of lines in a single pass and yield (kind, value):
+    - (HEADER, text following the header on the same line)
+    - (CHOICE, (label, text)) with the label upper-cased
+    - (ANSWER, answer text)
+    - (TEXT, line)
+    Blank, reference and 'Next Question' lines are dropped.
+    """
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    match_line = LINE_RE.match
+
+    for line in lines:
+        line = line.strip()
+
+        if not line:
+            continue
+
+        match = match_line(line)
+        if match is None:
+            yield TEXT, line
+            continue
+
+        kind = match.lastgroup
+        if kind == 'choice':
+            # Choices (A., B., C., D., etc.)
+            yield CHOICE, (match.group('label').upper(), match.group('choice').strip())
+        elif kind == 'answer':
+            yield ANSWER, match.group('answer').strip()
+        elif kind == 'header':
+            # The start of a new question
+            yield HEADER, line[match.end():].strip()
+        elif debug:
+            # Reference lines or 'Next Question'
+            logging.debug(f"Skipping reference or 'Next Question' line: {line}")
+
+class QuestionExtractor:
+    """
+    Builds questions from OCR text. Text can be fed in pieces (e.g. one OCR
+    page at a time); a question whose choices or answer continue on the next
+    page is stitched back together.
+    Assumes:
+    - Question starts with "Question X ( Single Topic )"
+    - Choices are A., B., C., D., etc.
+    - Answer is indicated by "Answer :"
+    """
+
+    def __init__(self):
+        self.current_question = None
+        self.current_choices = []
+        self.current_answer = None
+        self.inside_question = False
+
+    def _take_current(self):
+        # Return the question being built as a finished dict, if it is complete enough
+        if self.current_question and self.current_choices:
+            return {
+                'question': self.current_question.strip(),
+                'choices': self.current_choices,
+                'answer': self.current_answer
+            }
+        return None
+
+    def feed(self, text):
+        """Parse a piece of text and return the questions completed by it."""
+        logging.debug("Extracting questions and choices from text.")
+
+        questions = []
+
+        for kind, value in tokenize(text.split('\n')):
+            if kind == HEADER:
+                # If there's a current question, store it
+                question = self._take_current()
+                if question:
+                    questions.append(question)
+                # Start a new question
+                self.current_question = value
+                self.current_choices = []
+                self.current_answer = None
+                self.inside_question = True
+
+            elif kind == CHOICE:
+                label, choice_text = value
+                self.current_choices.append(f"{label}. {choice_text}")
+
+            elif kind == ANSWER:
+                self.current_answer = value
+
+            # Append to the current question
+            elif self.inside_question:
+                self.current_question += " " + value
+
+        return questions
+
+    def finish(self):
+        """Return the final question, if any, once all text has been fed."""
+        question = self._take_current()
+        self.__init__()
+        return [question] if question else []
+
+def extract_questions_and_choices(text):
+    """
+    Extract questions, choices, and answers from the corrected text.
+    See QuestionExtractor for the expected layout.
+    """
+    extractor = QuestionExtractor()
+    return extractor.feed(text) + extractor.finish()
+
+def iter_chunks(stream, size=TEXT_CHUNK_SIZE):
+    # Read a text stream in fixed-size pieces
+    return iter(lambda: stream.read(size), '')
+
+def _iter_blocks(chunks):
+    """
+    Yield the text following each question header up to the next header,
+    reading chunks lazily. Only the unfinished last block is buffered.
+    """
+    buffer = ''
+    body_start = None
+    for chunk in chunks:
+        buffer += chunk
+        last_header = None
+        for match in HEADER_RE.finditer(buffer, body_start or 0):
+            if body_start is not None:
+                yield buffer[body_start:match.start()]
+            body_start = match.end()
+            last_header = match
+
+        if last_header is not None:
+            # Keep only the block that is still open
+            buffer = buffer[last_header.end():]
+            body_start = 0
+        elif body_start is None:
+            # Nothing before the first header is needed, except a possibly split header
+            buffer = buffer[-_HEADER_CARRY:]
+
+    if body_start is not None:
+        yield buffer[body_start:]
+
+def _parse_block(body, index):
+    """
+    Turn the text after one question header into a review-page question, or
+    None if it lacks question text, two choices or a usable answer.
+    """
+    question_end = None
+    choices = []
+    answer = None
+    for match in BLOCK_LINE_RE.finditer(body):
+        if question_end is None:
+            question_end = match.start()
+        kind = match.lastgroup
+        if kind == 'choice':
+            choices.append(match.group('choice').strip())
+        elif kind == 'answer':
+            answer = match.group('answer').strip()
+
+    # Question content is everything before the first choice
+    question_content = body[:question_end].strip()
+
+    correct_answers = []
+    if answer and ANSWER_LETTERS_RE.fullmatch(answer):
+        # Map each letter to the corresponding choice text (e.g. "CD" -> choices 2 and 3)
+        for answer_letter in LETTER_RE.findall(answer):
+            answer_index = ord(answer_letter) - ord('A')
+            if 0 <= answer_index < len(choices):
+                correct_answers.append(choices[answer_index])
+    elif answer:
+        # Otherwise the answer must spell out choice texts; "Bad input" is not choice B
+        correct_answers = mask_choices(choice_text_mask(answer, choices), choices)
+
+    if question_content and len(choices) >= 2 and correct_answers:
+        return {
+            'question': question_content,
+            'choices': choices,
+            'correct_answer': ", ".join(correct_answers),  # Store as a comma-separated string
+            'index': index
+        }
+    return None
+
+def iter_text_questions(source):
+    """
+    Stream questions out of a pasted or uploaded question dump, one at a
+    time, for the text review page. source is a string or an iterable of
+    text chunks (see iter_chunks). Choices are returned without their letter
+    and an answer of choice letters is mapped to choice texts; any other
+    answer must name choices by their text. Incomplete questions are
+    skipped but still count towards 'index'.
+    """
+    chunks = (source,) if isinstance(source, str) else source
+    for index, body in enumerate(_iter_blocks(chunks), start=1):
+        question = _parse_block(body, index)
+        if question:
+            yield question
@@ -0,0 +1,99 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from database import apply_question_stats, fetch_question_stats
+
+# Answers are counted in memory and written to question_stats in one
+# transaction per flush, so a burst of submissions costs a single write
+STATS_FLUSH_INTERVAL = float(os.environ.get('STATS_FLUSH_INTERVAL', 2.0))      # seconds answers may wait
+STATS_FLUSH_MAX_PENDING = int(os.environ.get('STATS_FLUSH_MAX_PENDING', 5000))  # questions buffered before flushing early
+
+# question_id -> [attempts, correct, last_seen] not yet written
+_lock = threading.Lock()
+_pending = {}
+
+# One daemon thread does the periodic flushes, started by the first answer;
+# setting _wakeup makes it flush early
+_flusher = None
+_wakeup = threading.Event()
+
+# Only one flush writes at a time
+_flush_lock = threading.Lock()
+_counters = {'answers': 0, 'flushes': 0, 'rows_written': 0}
+
+def record_answers(results, answered_at=None):
+    """
+    Count a graded submission; results are (question_id, score) pairs and a
+    score of 1 counts as correct. The write happens on the next flush, at
+    most STATS_FLUSH_INTERVAL seconds later.
+    """
+    global _flusher
+    answered_at = answered_at or time.time()
+    with _lock:
+        for question_id, score in results:
+            entry = _pending.get(question_id)
+            if entry is None:
+                _pending[question_id] = [1, int(score == 1.0), answered_at]
+            else:
+                entry[0] += 1
+                entry[1] += score == 1.0
+                entry[2] = max(entry[2], answered_at)
+            _counters['answers'] += 1
+
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='question-stats-flusher', daemon=True)
+            _flusher.start()
+        if len(_pending) >= STATS_FLUSH_MAX_PENDING:
+            _wakeup.set()
+
+def _flush_loop():
+    # Lives for the whole process, so its pooled connection is reused by every flush
+    while True:
+        _wakeup.wait(STATS_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush_question_stats()
+        except Exception:
+            logging.exception("Question stats flush failed")
+
+def flush_question_stats():
+    """Write all pending answer counts in one transaction; returns the number of questions written."""
+    global _pending
+    with _flush_lock:
+        with _lock:
+            batch, _pending = _pending, {}
+        if not batch:
+            return 0
+
+        try:
+            apply_question_stats([(question_id, *entry) for question_id, entry in batch.items()])
+        except Exception as e:
+            # Keep the counts for the next flush rather than losing them
+            logging.error(f"Writing question stats failed: {str(e)}")
+            with _lock:
+                for question_id, (attempts, correct, last_seen) in batch.items():
+                    entry = _pending.setdefault(question_id, [0, 0, last_seen])
+                    entry[0] += attempts
+                    entry[1] += correct
+                    entry[2] = max(entry[2], last_seen)
+            return 0
+
+        with _lock:
+            _counters['flushes'] += 1
+            _counters['rows_written'] += len(batch)
+        return len(batch)
+
+def question_rankings(hardest=True, limit=20, min_attempts=1):
+    # Flush first so this process's latest answers are included
+    flush_question_stats()
+    return fetch_question_stats(hardest=hardest, limit=limit, min_attempts=min_attempts)
+
+def question_stats_counters():
+    with _lock:
+        return dict(_counters, pending=len(_pending))
+
+# Don't drop buffered answers when the process exits normally
+atexit.register(flush_question_stats)
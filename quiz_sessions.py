@@ -0,0 +1,93 @@
+import json
+import os
+import secrets
+import time
+from array import array
+
+from database import (insert_quiz_session, fetch_quiz_session, delete_quiz_session, delete_expired_quiz_sessions,
+                      fetch_questions_by_ids)
+from grading import compile_answer_mask, grade_submission, submitted_mask, score_answer
+
+# Server-side quiz sessions. Starting a quiz stores its question ids and
+# answer key (each question's answer mask and choice count) as packed arrays
+# in SQLite, with the question texts for the review page and the start time;
+# the cookie only carries a short token. The submission is graded and
+# reviewed from that one row instead of loading every question, and quizzes
+# can be as long as needed.
+QUIZ_SESSION_TTL = float(os.environ.get('QUIZ_SESSION_TTL', 24 * 3600))  # seconds a started quiz can be submitted
+
+def start_quiz_session(questions, now=None):
+    """Store a quiz over the given questions (as loaded by fetch_questions_by_ids); returns its token."""
+    now = now or time.time()
+    question_ids = array('q', (question['id'] for question in questions))
+    # A mask of 0 marks an answer that names no choice; those are graded from the question itself
+    answer_masks = array('Q', (question['answer_mask'] if question.get('answer_mask') is not None
+                               else compile_answer_mask(question['correct_answer'], question['choices'])
+                               for question in questions))
+    choice_counts = array('H', (len(question['choices']) for question in questions))
+    # [question, correct_answer, choices] in quiz order, for the review page
+    texts = json.dumps([[question['question'], question['correct_answer'], question['choices']] for question in questions],
+                       separators=(',', ':'))
+
+    delete_expired_quiz_sessions(now)
+    token = secrets.token_urlsafe(16)
+    insert_quiz_session(token, question_ids.tobytes(), answer_masks.tobytes(), choice_counts.tobytes(), texts,
+                        now, now + QUIZ_SESSION_TTL)
+    return token
+
+def load_quiz_session(token, now=None):
+    """
+    Return the quiz for token as a dict with 'question_ids', 'answer_masks'
+    and 'choice_counts' arrays, 'questions' (dicts with 'id', 'question',
+    'correct_answer' and 'choices', in quiz order) and 'started_at', or None
+    if it is unknown, expired or already submitted.
+    """
+    row = fetch_quiz_session(token, now or time.time())
+    if row is None:
+        return None
+
+    quiz = {'token': token, 'started_at': row['started_at']}
+    for name, typecode in (('question_ids', 'q'), ('answer_masks', 'Q'), ('choice_counts', 'H')):
+        values = array(typecode)
+        values.frombytes(row[name])
+        quiz[name] = values
+
+    if row['questions'] is None:
+        # Started before the question texts were stored with the session
+        quiz['questions'] = fetch_questions_by_ids(quiz['question_ids'])
+    else:
+        quiz['questions'] = [{'id': question_id, 'question': question, 'correct_answer': correct_answer, 'choices': choices}
+                             for question_id, (question, correct_answer, choices)
+                             in zip(quiz['question_ids'], json.loads(row['questions']))]
+    return quiz
+
+def end_quiz_session(token):
+    # False when the quiz was submitted already (e.g. a second click on Submit)
+    return delete_quiz_session(token)
+
+def grade_quiz(quiz, answers, partial_credit=False):
+    """
+    Grade a submission against the quiz's stored answer key. Same return
+    value as grading.grade_submission: (results, total) with results mapping
+    each question id to (selected_mask, score).
+    """
+    results = {}
+    total = 0.0
+    unresolved = []
+    for question_id, correct, choice_count in zip(quiz['question_ids'], quiz['answer_masks'], quiz['choice_counts']):
+        if not correct:
+            unresolved.append(question_id)
+            continue
+        selected = submitted_mask(answers.get(f"answer_{question_id}"), choice_count)
+        score = 1.0 if selected == correct else score_answer(selected, correct, partial_credit)
+        results[question_id] = (selected, score)
+        total += score
+
+    if unresolved:
+        # Answers that name no choice are compared as text
+        unresolved = set(unresolved)
+        extra, extra_total = grade_submission([question for question in quiz['questions'] if question['id'] in unresolved],
+                                              answers, partial_credit)
+        results.update(extra)
+        total += extra_total
+    return results, total
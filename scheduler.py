@@ -0,0 +1,58 @@
+import time
+
+from database import apply_review_results, fetch_due_question_ids, count_due_reviews
+
+# SM-2 spaced repetition. Each answered question has a repetition count, an
+# interval and an ease factor; a good answer pushes its next review further
+# out, a wrong one brings it back tomorrow. Due times live in an indexed
+# column, so the due queue is read in due order without scanning history.
+DAY = 24 * 3600
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+def answer_quality(score):
+    # Map a graded score onto SM-2's 0-5 recall quality
+    if score >= 1.0:
+        return 5
+    if score > 0:
+        return 3
+    return 1
+
+def next_review(repetitions, interval, ease, quality):
+    """
+    Apply one SM-2 step. interval is in days. Returns the new
+    (repetitions, interval, ease).
+    """
+    if quality < 3:
+        repetitions, interval = 0, 1.0
+    else:
+        if repetitions == 0:
+            interval = 1.0
+        elif repetitions == 1:
+            interval = 6.0
+        else:
+            interval = round(interval * ease)
+        repetitions += 1
+
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return repetitions, interval, ease
+
+def schedule_reviews(results, reviewed_at=None):
+    """Reschedule the answered questions; results are (question_id, score) pairs."""
+    reviewed_at = reviewed_at or time.time()
+    qualities = {question_id: answer_quality(score) for question_id, score in results}
+    if not qualities:
+        return
+
+    def reschedule(question_id, repetitions, interval, ease):
+        repetitions, interval, ease = next_review(repetitions, interval, ease, qualities[question_id])
+        return repetitions, interval, ease, reviewed_at + interval * DAY
+
+    apply_review_results(qualities, reschedule, reviewed_at, INITIAL_EASE)
+
+def due_question_ids(limit, now=None):
+    """Ids of up to limit questions due for review, most overdue first."""
+    return fetch_due_question_ids(now or time.time(), limit)
+
+def due_review_count(now=None):
+    return count_due_reviews(now or time.time())
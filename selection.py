@@ -0,0 +1,182 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from database import question_id_snapshot, fetch_answer_counts
+from question_stats import flush_question_stats
+
+# Adaptive quiz selection. Every question has a weight that grows the more
+# often it is answered wrong and shrinks for a while after it was seen; k
+# questions are drawn without replacement in proportion to their weights
+# from a Fenwick tree, in O(k log N).
+WEAKNESS_BOOST = float(os.environ.get('SELECTION_WEAKNESS_BOOST', 4.0))     # extra weight for a question always answered wrong
+RECENT_WINDOW = float(os.environ.get('SELECTION_RECENT_WINDOW', 24 * 3600))  # seconds a seen question is held back
+RECENT_FACTOR = float(os.environ.get('SELECTION_RECENT_FACTOR', 0.2))       # weight multiplier while held back
+
+def question_weight(attempts, correct, recent):
+    # Smoothed error rate, so unseen questions sit in the middle rather than at an extreme
+    error_rate = 1.0 - (correct + 1.0) / (attempts + 2.0)
+    weight = 1.0 + WEAKNESS_BOOST * error_rate
+    return weight * RECENT_FACTOR if recent else weight
+
+class FenwickTree:
+    """Prefix sums over a list of non-negative weights with O(log N) updates and searches."""
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        # Linear-time build: push each node's total into its parent
+        self.tree = [0.0] + list(weights)
+        for index in range(1, self.size + 1):
+            parent = index + (index & -index)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[index]
+        self._top = 1 << self.size.bit_length() if self.size else 0
+
+    def add(self, position, delta):
+        index = position + 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def total(self):
+        result = 0.0
+        index = self.size
+        while index > 0:
+            result += self.tree[index]
+            index -= index & -index
+        return result
+
+    def find(self, target):
+        """Return the position whose cumulative weight range contains target."""
+        position = 0
+        step = self._top
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step >>= 1
+        return min(position, self.size - 1)
+
+class SelectionEngine:
+    """
+    Weighted sampler over one snapshot of the question bank. Weights are
+    updated in place as answers come in; the engine is rebuilt only when the
+    set of question ids changes.
+    """
+
+    def __init__(self, ids, answer_counts, now=None):
+        now = now or time.time()
+        self.ids = ids
+        self.positions = {question_id: position for position, question_id in enumerate(ids)}
+        self.attempts = [0] * len(ids)
+        self.correct = [0] * len(ids)
+        self.weights = [0.0] * len(ids)
+        # (seen_at, position) of questions currently held back, oldest first
+        self.recent = deque()
+        self.last_seen = {}
+        self._lock = threading.Lock()
+
+        held_back = []
+        for position, question_id in enumerate(ids):
+            attempts, correct, last_seen = answer_counts.get(question_id, (0, 0, None))
+            self.attempts[position] = attempts
+            self.correct[position] = correct
+            recent = last_seen is not None and now - last_seen < RECENT_WINDOW
+            if recent:
+                held_back.append((last_seen, position))
+                self.last_seen[position] = last_seen
+            self.weights[position] = question_weight(attempts, correct, recent)
+        for entry in sorted(held_back):
+            self.recent.append(entry)
+        self.tree = FenwickTree(self.weights)
+
+    def _set_weight(self, position, weight):
+        self.tree.add(position, weight - self.weights[position])
+        self.weights[position] = weight
+
+    def _release_held_back(self, now):
+        # Questions seen more than RECENT_WINDOW ago get their full weight back
+        while self.recent and now - self.recent[0][0] >= RECENT_WINDOW:
+            seen_at, position = self.recent.popleft()
+            if self.last_seen.get(position) == seen_at:
+                del self.last_seen[position]
+                self._set_weight(position, question_weight(self.attempts[position], self.correct[position], False))
+
+    def sample(self, k):
+        """Draw up to k distinct question ids with probability proportional to their weights."""
+        with self._lock:
+            self._release_held_back(time.time())
+            k = min(k, len(self.ids))
+
+            # Zero each pick's weight so it can't be drawn again, then restore them all
+            picked = []
+            total = self.tree.total()
+            for _ in range(k):
+                if total <= 0:
+                    break
+                position = self.tree.find(random.random() * total)
+                if self.weights[position] <= 0:
+                    # Float rounding landed on an already picked question; draw again
+                    position = self._first_unpicked(position)
+                    if position is None:
+                        break
+                picked.append((position, self.weights[position]))
+                total -= self.weights[position]
+                self._set_weight(position, 0.0)
+
+            for position, weight in picked:
+                self._set_weight(position, weight)
+            return [self.ids[position] for position, _ in picked]
+
+    def _first_unpicked(self, position):
+        for candidate in range(position, len(self.ids)):
+            if self.weights[candidate] > 0:
+                return candidate
+        for candidate in range(position - 1, -1, -1):
+            if self.weights[candidate] > 0:
+                return candidate
+        return None
+
+    def record_results(self, results, answered_at=None):
+        """Update the weights of answered questions; results are (question_id, score) pairs."""
+        answered_at = answered_at or time.time()
+        with self._lock:
+            for question_id, score in results:
+                position = self.positions.get(question_id)
+                if position is None:
+                    continue
+                self.attempts[position] += 1
+                self.correct[position] += score == 1.0
+                self.last_seen[position] = answered_at
+                self.recent.append((answered_at, position))
+                self._set_weight(position, question_weight(self.attempts[position], self.correct[position], True))
+            self._release_held_back(answered_at)
+
+_engine_lock = threading.Lock()
+_engine = None
+
+def get_engine():
+    """Return the selection engine for the current question bank, building it when the ids change."""
+    global _engine
+    _, ids = question_id_snapshot()
+    with _engine_lock:
+        if _engine is not None and _engine.ids is not ids and _engine.ids == ids:
+            # The id list was reloaded but nothing changed; keep the weights
+            _engine.ids = ids
+        elif _engine is None or _engine.ids is not ids:
+            # Build from the stored counts, including answers still buffered in this process
+            flush_question_stats()
+            _engine = SelectionEngine(ids, fetch_answer_counts())
+        return _engine
+
+def select_question_ids(k):
+    return get_engine().sample(k)
+
+def record_results(results):
+    # Only an engine that was already built needs updating; a new one reads the stored counts
+    engine = _engine
+    if engine is not None:
+        engine.record_results(results)
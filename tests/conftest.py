@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+@pytest.fixture
+def temp_db(tmp_path):
+    # A fresh database per test; quiz.db is never touched
+    original = database.DB_PATH
+    database.close_all_connections()
+    database.DB_PATH = str(tmp_path / 'test.db')
+    database.init_db()
+    yield database.DB_PATH
+    database.close_all_connections()
+    database.DB_PATH = original
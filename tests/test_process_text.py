@@ -0,0 +1,45 @@
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip('flask')
+
+DUMP = """Question 1 ( Single Topic )
+Which port does HTTPS use by default?
+A. 80
+B. 443
+C. 8080
+Answer : B
+
+Question 2 ( Single Topic )
+Which of these are prime?
+A. 2
+B. 4
+C. 7
+Answer : AC
+"""
+
+@pytest.fixture
+def client(temp_db):
+    from app import app
+    app.config['TESTING'] = True
+    return app.test_client()
+
+def rendered_questions(response):
+    # The review page streams; reading it all runs the parser after the request has been torn down
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+def test_pasted_dump_is_parsed(client):
+    page = rendered_questions(client.post('/process_text', data={'questionText': DUMP}))
+    assert 'Which port does HTTPS use by default?' in page
+    assert '>443</textarea>' in page
+    assert '>2, 7</textarea>' in page
+
+def test_uploaded_dump_is_parsed(client):
+    response = client.post('/process_text', content_type='multipart/form-data',
+                           data={'questionText': '', 'questionFile': (BytesIO(DUMP.encode()), 'dump.txt')})
+    page = rendered_questions(response)
+    assert 'name="question_1"' in page and 'name="question_2"' in page
+    assert 'Which of these are prime?' in page
+    assert '>2, 7</textarea>' in page
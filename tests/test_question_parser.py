@@ -0,0 +1,21 @@
+import pytest
+
+from question_parser import iter_text_questions
+
+def parse_answer(answer):
+    dump = f"Question 1 ( Single Topic )\nWhat is it?\nA. one\nB. two\nC. three, four\nAnswer : {answer}\n"
+    return [question['correct_answer'] for question in iter_text_questions(dump)]
+
+@pytest.mark.parametrize('answer, expected', [
+    ('B', ['two']),
+    ('AC', ['one, three, four']),
+    ('A, C', ['one, three, four']),
+    ('two', ['two']),
+    ('one, three, four', ['one, three, four']),
+])
+def test_answer_letters_and_choice_texts(answer, expected):
+    assert parse_answer(answer) == expected
+
+def test_free_text_answer_is_not_read_as_letters():
+    # "Bad input" starts with B but names no choice; the question is skipped
+    assert parse_answer('Bad input') == []
@@ -0,0 +1,126 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+import url_ingest
+
+# Seconds each /slow/ page takes to answer
+SLOW_DELAY = 0.2
+
+def question_page(name, next_href=None):
+    link = f'<a rel="next" href="{next_href}">Next</a>' if next_href else ''
+    return (f'<div class="card"><div class="question_text">Question {name}?</div>'
+            f'<ul class="choices-list"><li>A. one</li><li>B. two</li></ul></div>{link}').encode()
+
+class PageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), PageHandler)
+        self.lock = threading.Lock()
+        self.paths = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.not_modified = 0
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+class PageHandler(BaseHTTPRequestHandler):
+    # /slow/<n>   answers after SLOW_DELAY
+    # /etag       carries an ETag and answers 304 when it is sent back
+    # /crawl/<n>  links to /crawl/<n+1> with rel="next", forever
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.paths.append(self.path)
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            self.respond()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def respond(self):
+        if self.path.startswith('/slow/'):
+            time.sleep(SLOW_DELAY)
+            self.send_page(question_page(self.path))
+        elif self.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                with self.server.lock:
+                    self.server.not_modified += 1
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_page(question_page('etag'), {'ETag': '"v1"'})
+        elif match := re.fullmatch(r'/crawl/(\d+)', self.path):
+            page = int(match.group(1))
+            self.send_page(question_page(f'crawl {page}', f'/crawl/{page + 1}'))
+        else:
+            self.send_error(404)
+
+    def send_page(self, body, headers=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def page_server():
+    server = PageServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_pages_are_fetched_concurrently(temp_db, page_server, monkeypatch):
+    monkeypatch.setattr(url_ingest, 'URL_FETCH_WORKERS', 4)
+    urls = [page_server.url(f'/slow/{i}') for i in range(4)]
+
+    started = time.perf_counter()
+    questions, errors = url_ingest.ingest_urls(urls)
+    elapsed = time.perf_counter() - started
+
+    assert errors == []
+    # Results keep the order the URLs were given in
+    assert [question['question'] for question in questions] == [f'Question /slow/{i}?' for i in range(4)]
+    assert page_server.peak_in_flight > 1
+    assert elapsed < 4 * SLOW_DELAY
+
+def test_unchanged_page_is_revalidated_from_the_cache(temp_db, page_server, monkeypatch):
+    touched = []
+    touch_http_cache = url_ingest.touch_http_cache
+    monkeypatch.setattr(url_ingest, 'touch_http_cache', lambda url: touched.append(url) or touch_http_cache(url))
+    url = page_server.url('/etag')
+
+    first, _ = url_ingest.ingest_urls([url])
+    assert page_server.not_modified == 0
+    assert touched == []
+
+    second, errors = url_ingest.ingest_urls([url])
+    assert errors == []
+    assert page_server.not_modified == 1
+    assert touched == [url]
+    # The 304 is answered with the cached body
+    assert second == first
+    assert [question['question'] for question in second] == ['Question etag?']
+
+def test_next_links_are_followed_up_to_max_pages(temp_db, page_server):
+    questions, errors = url_ingest.ingest_urls([page_server.url('/crawl/1')], max_pages=3)
+
+    assert errors == []
+    assert [question['question'] for question in questions] == [f'Question crawl {page}?' for page in (1, 2, 3)]
+    assert page_server.paths == ['/crawl/1', '/crawl/2', '/crawl/3']
@@ -0,0 +1,251 @@
+import asyncio
+import contextvars
+import importlib.util
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+import aio
+from database import fetch_http_cache, store_http_cache, touch_http_cache
+from metrics import stage
+
+# Concurrency and timeouts for fetching question pages
+URL_FETCH_WORKERS = int(os.environ.get('URL_FETCH_WORKERS', 8))
+URL_CONNECT_TIMEOUT = float(os.environ.get('URL_CONNECT_TIMEOUT', 5))
+URL_READ_TIMEOUT = float(os.environ.get('URL_READ_TIMEOUT', 20))
+URL_MAX_PAGES = int(os.environ.get('URL_MAX_PAGES', 50))      # cap for a single crawl
+HTTP_CACHE_MAX_ENTRIES = int(os.environ.get('HTTP_CACHE_MAX_ENTRIES', 2000))
+
+# lxml is several times faster than the pure-Python parser; use it when installed
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# In the ASGI serving mode pages are fetched with httpx's async client when
+# installed; otherwise the blocking fetch runs on the offload pool
+ASYNC_HTTP = importlib.util.find_spec('httpx') is not None
+
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+
+def get_session():
+    """Shared requests session with a connection pool sized for the fetch workers."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=URL_FETCH_WORKERS, pool_maxsize=URL_FETCH_WORKERS, max_retries=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def _revalidation_headers(cached):
+    headers = {}
+    if cached is not None:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+def fetch_page(url):
+    """
+    Fetch a page body, revalidating any cached copy with If-None-Match /
+    If-Modified-Since so unchanged pages are not downloaded again.
+    Raises requests.exceptions.RequestException on failure.
+    """
+    cached = fetch_http_cache(url)
+    headers = _revalidation_headers(cached)
+
+    with stage('fetch'):
+        response = get_session().get(url, headers=headers, timeout=(URL_CONNECT_TIMEOUT, URL_READ_TIMEOUT))
+    if response.status_code == 304 and cached is not None:
+        logging.debug("Not modified, using cached copy of %s", url)
+        touch_http_cache(url)
+        return cached['body']
+
+    response.raise_for_status()
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        store_http_cache(url, etag, last_modified, response.content, HTTP_CACHE_MAX_ENTRIES)
+    return response.content
+
+def _get_async_client():
+    # One client per process, created on the serving loop; its pool is shared by all requests
+    global _async_client
+    if _async_client is None:
+        import httpx
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(URL_READ_TIMEOUT, connect=URL_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=URL_FETCH_WORKERS * 4),
+            follow_redirects=True,
+        )
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
+
+async def fetch_page_async(url):
+    """
+    fetch_page on the event loop: the request is awaited on the shared
+    async client and the HTTP cache reads and writes go to the offload pool.
+    Raises httpx.HTTPError on failure.
+    """
+    cached = await aio.offload(fetch_http_cache, url)
+    headers = _revalidation_headers(cached)
+
+    with stage('fetch'):
+        response = await _get_async_client().get(url, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        logging.debug("Not modified, using cached copy of %s", url)
+        await aio.offload(touch_http_cache, url)
+        return cached['body']
+
+    response.raise_for_status()
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        await aio.offload(store_http_cache, url, etag, last_modified, response.content, HTTP_CACHE_MAX_ENTRIES)
+    return response.content
+
+def parse_questions(html):
+    """Extract questions and choices from the div.card blocks of a question page."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    questions = []
+    for card in soup.find_all('div', class_='card'):
+        question_div = card.find('div', class_='question_text')
+        choices_list = card.find('ul', class_='choices-list')
+        if question_div is None or choices_list is None:
+            continue
+
+        question_text = question_div.get_text(strip=True)
+        choices = [choice.get_text(strip=True) for choice in choices_list.find_all('li')]
+
+        if len(choices) >= 2:  # Ensure there are at least 2 choices
+            questions.append({
+                'question': question_text,
+                'choices': choices
+            })
+
+    return questions, soup
+
+def _next_page_url(soup, url):
+    # Follow <link rel="next"> or <a rel="next"> pagination
+    link = soup.find(['link', 'a'], rel='next')
+    if link is None or not link.get('href'):
+        return None
+    return urljoin(url, link['href'])
+
+def _parse_page(html, url):
+    questions, soup = parse_questions(html)
+    return questions, _next_page_url(soup, url)
+
+def _fetch_and_parse(url):
+    return _parse_page(fetch_page(url), url)
+
+def _submit_fetch(executor, url):
+    # Run in a copy of the caller's context so the fetch stages and cache
+    # queries are counted towards the request that asked for them
+    return executor.submit(contextvars.copy_context().run, _fetch_and_parse, url)
+
+def _expand_urls(urls, max_pages):
+    # Each entry is (url, follow_next_links)
+    expanded = []
+    for url in urls:
+        if '{page}' in url:
+            expanded.extend((url.replace('{page}', str(page)), False) for page in range(1, max_pages + 1))
+        else:
+            expanded.append((url, True))
+    return expanded
+
+def ingest_urls(urls, max_pages=1):
+    """
+    Fetch and parse many question pages concurrently.
+    - A URL containing "{page}" is expanded to pages 1..max_pages.
+    - Any other URL is crawled by following rel="next" links, up to
+      max_pages pages per URL (max_pages=1 fetches only the URL itself).
+    Returns (questions, errors), questions in the order the URLs were given
+    and errors as a list of (url, message).
+    """
+    max_pages = max(1, min(max_pages, URL_MAX_PAGES))
+    expanded = _expand_urls(urls, max_pages)
+
+    order = [url for url, _ in expanded]
+    seen = set(order)
+    results = {}
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=URL_FETCH_WORKERS) as executor:
+        # Crawl chains carry their depth so following next links respects max_pages
+        pending = {_submit_fetch(executor, url): (url, follow, 1) for url, follow in expanded}
+        while pending:
+            future = next(iter(pending))
+            url, follow, depth = pending.pop(future)
+            try:
+                questions, next_url = future.result()
+            except Exception as e:
+                logging.error(f"Error fetching {url}: {str(e)}")
+                errors.append((url, str(e)))
+                continue
+
+            results[url] = questions
+            if follow and next_url and next_url not in seen and depth < max_pages:
+                seen.add(next_url)
+                order.insert(order.index(url) + 1, next_url)
+                pending[_submit_fetch(executor, next_url)] = (next_url, True, depth + 1)
+
+    questions = [question for url in order for question in results.get(url, [])]
+    return questions, errors
+
+async def ingest_urls_async(urls, max_pages=1):
+    """
+    ingest_urls for the ASGI serving mode: pages are fetched concurrently
+    on the event loop (at most URL_FETCH_WORKERS at a time per call) and
+    parsed on the offload pool. Same arguments and return value.
+    """
+    max_pages = max(1, min(max_pages, URL_MAX_PAGES))
+    expanded = _expand_urls(urls, max_pages)
+
+    order = [url for url, _ in expanded]
+    seen = set(order)
+    results = {}
+    errors = []
+    limit = asyncio.Semaphore(URL_FETCH_WORKERS)
+
+    async def fetch_and_parse(url):
+        async with limit:
+            html = await (fetch_page_async(url) if ASYNC_HTTP else aio.offload(fetch_page, url))
+        # BeautifulSoup is CPU-bound; keep it off the loop
+        return await aio.offload(_parse_page, html, url)
+
+    pending = {asyncio.ensure_future(fetch_and_parse(url)): (url, follow, 1) for url, follow in expanded}
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            url, follow, depth = pending.pop(task)
+            try:
+                questions, next_url = task.result()
+            except Exception as e:
+                logging.error(f"Error fetching {url}: {str(e)}")
+                errors.append((url, str(e)))
+                continue
+
+            results[url] = questions
+            if follow and next_url and next_url not in seen and depth < max_pages:
+                seen.add(next_url)
+                order.insert(order.index(url) + 1, next_url)
+                pending[asyncio.ensure_future(fetch_and_parse(next_url))] = (next_url, True, depth + 1)
+
+    questions = [question for url in order for question in results.get(url, [])]
+    return questions, errors